@@ -0,0 +1,215 @@
+"""Times the astrometry hot paths of the mount on a simulated Radiotelescope.
+
+    PYTHONPATH=. python benchmarks/astrometry.py --save
+    PYTHONPATH=. python benchmarks/astrometry.py --compare
+
+--save writes the results as the baseline, --compare flags every case whose
+median or allocation peak grew past the tolerance, and by more than the
+floor in FLOORS, and exits with 1, or with 2
+when there is no baseline to compare with.
+"""
+
+import os
+import sys
+import json
+import itertools
+import socket
+import argparse
+import platform
+import tracemalloc
+import numpy as np
+from time import time
+from time import perf_counter_ns
+
+os.environ.setdefault("SERVER_SIMULATE", "1")
+os.environ.setdefault("LOG_STDOUT", "0")
+
+from astropy import units
+from astropy.coordinates import AltAz
+from astropy.coordinates import EarthLocation
+from astropy.time import Time
+from classes.Startup import Startup
+from classes.Ephemeris import Ephemeris
+
+BASELINE = os.path.join(os.path.dirname(__file__), "astrometry.json")
+# smallest growth that counts, below it run to run noise is a large percentage
+FLOORS = {"p50_us": 5.0, "alloc_peak_kb": 1.0}
+
+
+def cases(mount):
+    """name -> callable, inputs drawn once so every run times the same work"""
+    rng = np.random.default_rng(0)
+    location = EarthLocation(lat=45.5 * units.deg, lon=9.2 * units.deg, height=120)
+    mount.set_location(location)
+    mount.set_target(ra=83.63 * units.deg, dec=22.01 * units.deg)
+
+    n = 4096
+    alts, azs = rng.uniform(20, 80, n), rng.uniform(0, 360, n)
+    ras, decs = rng.uniform(0, 360, n), rng.uniform(-30, 80, n)
+    counter = itertools.count()
+
+    def next_altaz():
+        k = next(counter) % n
+        return alts[k], azs[k]
+
+    def next_radec():
+        k = next(counter) % n
+        return ras[k], decs[k]
+
+    def set_target_altaz():
+        alt, az = next_altaz()
+        mount.set_target(alt=alt * units.deg, az=az * units.deg)
+
+    def set_target_radec():
+        ra, dec = next_radec()
+        mount.set_target(ra=ra * units.deg, dec=dec * units.deg)
+
+    def set_absolute_offset():
+        alt, az = next_altaz()
+        mount.set_absolute_offset(alt=alt * units.deg, az=az * units.deg)
+
+    def set_relative_offset():
+        alt, az = next_altaz()
+        mount.set_relative_offset(alt=alt / 20 * units.deg, az=az / 90 * units.deg)
+
+    def route_plan():
+        # what the route behavior does before moving, __linear_path before it
+        mount.set_relative_offset(az=10 * units.deg)
+        path_coords = mount.trajectory.path(mount.get_offset(), mount.get_target())
+        frame = AltAz(obstime=Time.now(), location=location)
+        altaz_coords = path_coords.transform_to(frame)
+        mount.trajectory.profile(altaz_coords.az.deg, altaz_coords.alt.deg)
+
+    ephemeris = Ephemeris(mount.get_target(), location)
+
+    def follow_tick():
+        t = time()
+        ephemeris.at(t)
+        ephemeris.rate_at(t)
+
+    def ephemeris_build():
+        Ephemeris(mount.get_target(), location)
+
+    return {
+        "set_target_altaz": (set_target_altaz, 200),
+        "set_target_radec": (set_target_radec, 2000),
+        "set_absolute_offset": (set_absolute_offset, 200),
+        "set_relative_offset": (set_relative_offset, 200),
+        "route_plan": (route_plan, 50),
+        "follow_tick": (follow_tick, 5000),
+        "ephemeris_build": (ephemeris_build, 10),
+    }
+
+
+def measure(fn, calls: int, warmup: int = 5) -> dict:
+    for _ in range(warmup):
+        fn()
+
+    samples = np.empty(calls)
+    for i in range(calls):
+        start = perf_counter_ns()
+        fn()
+        samples[i] = perf_counter_ns() - start
+    samples /= 1e3  # us
+
+    # allocations in a separate pass, tracing slows every call down
+    traced = max(1, min(calls, 20))
+    tracemalloc.start()
+    peak = retained = 0
+    for _ in range(traced):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fn()
+        current, top = tracemalloc.get_traced_memory()
+        peak = max(peak, top - before)
+        retained += current - before
+    tracemalloc.stop()
+
+    return {
+        "calls": calls,
+        "mean_us": round(float(samples.mean()), 2),
+        "p50_us": round(float(np.percentile(samples, 50)), 2),
+        "p90_us": round(float(np.percentile(samples, 90)), 2),
+        "p99_us": round(float(np.percentile(samples, 99)), 2),
+        "max_us": round(float(samples.max()), 2),
+        "alloc_peak_kb": round(peak / 1024, 1),
+        "alloc_retained_kb": round(retained / traced / 1024, 1),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Cases slower or hungrier than the baseline by more than tolerance and
+    by more than the floor"""
+    regressions = []
+    for name, now in results.items():
+        before = baseline.get("cases", {}).get(name)
+        if before is None:
+            continue
+        for key, floor in FLOORS.items():
+            if (
+                before[key] > 0
+                and now[key] > before[key] * (1 + tolerance)
+                and now[key] - before[key] > floor
+            ):
+                regressions.append(
+                    f"{name} {key} {before[key]} -> {now[key]} "
+                    f"(+{(now[key] / before[key] - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="write the baseline")
+    parser.add_argument("--compare", action="store_true", help="check the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--only", nargs="*", help="case names to run")
+    parser.add_argument("--scale", type=float, default=1.0, help="calls multiplier")
+    args = parser.parse_args()
+
+    if args.compare and not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}, run --save first")
+        return 2
+
+    mount = Startup.get_mount()
+    results = {}
+    for name, (fn, calls) in cases(mount).items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = measure(fn, max(1, int(calls * args.scale)))
+        r = results[name]
+        print(
+            f"{name:<22} p50 {r['p50_us']:>10.1f}us  p90 {r['p90_us']:>10.1f}us  "
+            f"p99 {r['p99_us']:>10.1f}us  peak {r['alloc_peak_kb']:>8.1f}kB"
+        )
+
+    report = {
+        "machine": {
+            "host": socket.gethostname(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+        },
+        "created": round(time()),
+        "cases": results,
+    }
+
+    status = 0
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["machine"]["host"] != report["machine"]["host"]:
+            print(f"baseline is from {baseline['machine']['host']}")
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        status = 1 if regressions else 0
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""Load test of the session/mount API while the mount is following a target.
+
+    PYTHONPATH=. python benchmarks/loadtest.py --viewers 16 --poll-hz 5
+    PYTHONPATH=. python benchmarks/loadtest.py --url http://127.0.0.1:56361
+
+Without --url the Flask app is driven in-process through its test client.
+An operator client repeats the curls.sh session (target, run, poll, stop)
+while the viewers poll /mount/status. Every run's control loop statistics
+are read back at the end of it.
+"""
+
+import os
+import sys
+import json
+import argparse
+import threading
+import http.client
+import numpy as np
+from time import sleep
+from time import monotonic
+from urllib.parse import urlsplit
+from collections import defaultdict
+
+os.environ.setdefault("SERVER_SIMULATE", "1")
+os.environ.setdefault("LOG_STDOUT", "0")
+
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+LOCATION = {"lat": 45.3833, "lon": 10.668056, "height": 145}
+TARGETS = [
+    {"ra": "15h21m24s", "dec": "-33d6m12s"},
+    {"az": "181d33m", "alt": "11d19m"},
+    {"name": "Cas A"},
+]
+
+
+class HttpClient:
+    """One keep-alive connection to a running server"""
+
+    def __init__(self, url: str, sid: str | None = None):
+        parts = urlsplit(url)
+        self.__conn = http.client.HTTPConnection(parts.hostname, parts.port or 80)
+        self.sid = sid
+
+    def request(self, method: str, path: str, body=None, etag=None):
+        headers = {"Content-Type": "application/json"}
+        if self.sid:
+            headers["Authorization"] = self.sid
+        if etag:
+            headers["If-None-Match"] = etag
+        payload = None if body is None else json.dumps(body)
+        self.__conn.request(method, path, body=payload, headers=headers)
+        response = self.__conn.getresponse()
+        data = response.read()
+        return response.status, data, response.getheader("ETag")
+
+
+class AppClient:
+    """The Flask app in this process, through its test client"""
+
+    app = None
+
+    def __init__(self, url=None, sid: str | None = None):
+        if AppClient.app is None:
+            from main import app
+
+            AppClient.app = app
+        self.__client = AppClient.app.test_client()
+        self.sid = sid
+
+    def request(self, method: str, path: str, body=None, etag=None):
+        headers = {}
+        if self.sid:
+            headers["Authorization"] = self.sid
+        if etag:
+            headers["If-None-Match"] = etag
+        response = self.__client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.data, response.headers.get("ETag")
+
+
+class Recorder:
+    """Latencies per endpoint, shared by the client threads"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def call(self, client, method: str, path: str, body=None, etag=None):
+        start = monotonic()
+        try:
+            status, data, etag = client.request(method, path, body, etag)
+        except Exception:
+            status, data, etag = None, b"", None
+        elapsed = (monotonic() - start) * 1e3
+        name = f"{method} {path.split('?')[0]}"
+        with self.lock:
+            self.latencies[name].append(elapsed)
+            if status is None or status >= 400:
+                self.errors[name] += 1
+        return status, data, etag
+
+    def report(self, seconds: float) -> dict:
+        endpoints = {}
+        for name, samples in sorted(self.latencies.items()):
+            samples = np.array(samples)
+            counts = np.histogram(samples, bins=[0, *BUCKETS_MS, np.inf])[0]
+            endpoints[name] = {
+                "requests": len(samples),
+                "errors": self.errors[name],
+                "rps": round(len(samples) / seconds, 1),
+                "p50_ms": round(float(np.percentile(samples, 50)), 2),
+                "p90_ms": round(float(np.percentile(samples, 90)), 2),
+                "p99_ms": round(float(np.percentile(samples, 99)), 2),
+                "max_ms": round(float(samples.max()), 2),
+                "histogram": {
+                    f"<{edge}ms" if edge != np.inf else f">={BUCKETS_MS[-1]}ms": int(n)
+                    for edge, n in zip([*BUCKETS_MS, np.inf], counts)
+                },
+            }
+        return endpoints
+
+
+def viewer(client, recorder, stop: threading.Event, poll_hz: float, etag: bool):
+    last = None
+    period = 1 / poll_hz if poll_hz > 0 else 0.0
+    while not stop.is_set():
+        start = monotonic()
+        _, _, tag = recorder.call(
+            client, "GET", "/mount/status", etag=last if etag else None
+        )
+        last = tag or last
+        if period:
+            stop.wait(max(0.0, period - (monotonic() - start)))
+
+
+def operator(client, recorder, stop: threading.Event, run_s: float, runs: list):
+    k = 0
+    while not stop.is_set():
+        recorder.call(client, "POST", "/mount/target", TARGETS[k % len(TARGETS)])
+        k += 1
+        status, _, _ = recorder.call(client, "GET", "/mount/run?bh=follow")
+        if status != 200:
+            stop.wait(0.5)
+            continue
+        end = monotonic() + run_s
+        while monotonic() < end and not stop.is_set():
+            recorder.call(client, "GET", "/mount/status")
+            stop.wait(1.0)
+        recorder.call(client, "GET", "/mount/stop")
+        status, data, _ = recorder.call(client, "GET", "/mount/control")
+        if status == 200:
+            runs.append(json.loads(data))
+        while not stop.is_set():  # the next run waits for this one to unwind
+            status, data, _ = recorder.call(client, "GET", "/mount/runs")
+            if status != 200 or all(
+                r["status"] not in ["queued", "running"]
+                for r in json.loads(data)["runs"]
+            ):
+                break
+            sleep(0.05)
+
+
+def summarize_runs(runs: list) -> dict | None:
+    if not runs:
+        return None
+    ticks = sum(r["ticks"] for r in runs)
+    return {
+        "runs": len(runs),
+        "ticks": ticks,
+        "overruns": sum(r["overruns"] for r in runs),
+        "jitter_rms_ms": round(
+            (
+                (sum(r["jitter_rms_ms"] ** 2 * r["ticks"] for r in runs) / ticks) ** 0.5
+                if ticks
+                else 0.0
+            ),
+            3,
+        ),
+        "jitter_max_ms": round(max(r["jitter_max_ms"] for r in runs), 3),
+        "stop_latency_ms": round(max(r["stop_latency_ms"] or 0.0 for r in runs), 3),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="running server, in-process app if omitted")
+    parser.add_argument("--viewers", type=int, default=8)
+    parser.add_argument("--poll-hz", type=float, default=5, help="0 polls flat out")
+    parser.add_argument("--etag", action="store_true", help="conditional polls")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--run-s", type=float, default=5, help="length of each run")
+    parser.add_argument("--json", action="store_true", help="print the report only")
+    args = parser.parse_args()
+
+    Client = HttpClient if args.url else AppClient
+    setup = Client(args.url)
+    status, data, _ = setup.request("GET", "/session/acquire")
+    if status != 200:
+        print(f"cannot acquire the session: {status} {data.decode()}")
+        return 1
+    sid = json.loads(data)["session_id"]
+    setup.sid = sid
+
+    recorder, stop, runs = Recorder(), threading.Event(), []
+    try:
+        recorder.call(setup, "POST", "/mount/location", LOCATION)
+        threads = [
+            threading.Thread(
+                target=operator,
+                args=(Client(args.url, sid), recorder, stop, args.run_s, runs),
+            )
+        ]
+        for _ in range(args.viewers):
+            threads.append(
+                threading.Thread(
+                    target=viewer,
+                    args=(
+                        Client(args.url, sid),
+                        recorder,
+                        stop,
+                        args.poll_hz,
+                        args.etag,
+                    ),
+                )
+            )
+        start = monotonic()
+        for thread in threads:
+            thread.start()
+        stop.wait(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        seconds = monotonic() - start
+    finally:
+        setup.request("GET", "/mount/stop")
+        setup.request("GET", "/session/release")
+
+    endpoints = recorder.report(seconds)
+    report = {
+        "mode": args.url or "in-process",
+        "viewers": args.viewers,
+        "poll_hz": args.poll_hz,
+        "seconds": round(seconds, 2),
+        "rps": round(sum(e["requests"] for e in endpoints.values()) / seconds, 1),
+        "endpoints": endpoints,
+        "control": summarize_runs(runs),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print(
+        f"{report['mode']}: {args.viewers} viewers at {args.poll_hz} Hz, "
+        f"{report['rps']} req/s over {report['seconds']}s"
+    )
+    for name, e in endpoints.items():
+        print(
+            f"  {name:<20} {e['requests']:>7} req {e['rps']:>8} req/s "
+            f"p50 {e['p50_ms']:>7.2f}ms p99 {e['p99_ms']:>7.2f}ms "
+            f"max {e['max_ms']:>8.2f}ms errors {e['errors']}"
+        )
+    status_histogram = endpoints.get("GET /mount/status", {}).get("histogram", {})
+    print(
+        "  /mount/status " + " ".join(f"{k}:{v}" for k, v in status_histogram.items())
+    )
+    control = report["control"]
+    if control:
+        print(
+            f"  control loop: {control['runs']} runs, {control['ticks']} ticks, "
+            f"{control['overruns']} overruns, jitter rms {control['jitter_rms_ms']}ms "
+            f"max {control['jitter_max_ms']}ms"
+        )
+    else:
+        print("  control loop: no run completed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
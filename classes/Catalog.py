@@ -0,0 +1,150 @@
+import os
+import csv
+import threading
+import numpy as np
+from time import perf_counter
+from classes.Logging import Logging
+
+
+class Catalog:
+    """Named sources with precomputed ICRS coordinates, searched in arrays"""
+
+    _path = os.path.join("data", "catalog.csv")
+    _lock = threading.Lock()
+    _table = None  # columns sorted by dec, swapped in whole
+    _names = None  # normalized name or alias -> row
+
+    @staticmethod
+    def normalize(name: str) -> str:
+        return "".join(c for c in name.lower() if c.isalnum() or c == "*")
+
+    @staticmethod
+    def load(path: str | None = None):
+        """Reads the catalog into arrays sorted by declination, once"""
+        if Catalog._table is not None and path is None:
+            return Catalog._table
+        with Catalog._lock:
+            if Catalog._table is not None and path is None:
+                return Catalog._table
+            start = perf_counter()
+            with open(path or Catalog._path, newline="", encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+
+            ra = np.array([float(r["ra"]) for r in rows])
+            dec = np.array([float(r["dec"]) for r in rows])
+            order = np.argsort(dec, kind="stable")  # the spatial index
+            table = {
+                "name": np.array([rows[i]["name"] for i in order]),
+                "kind": np.array([rows[i]["kind"] for i in order]),
+                "ra": ra[order],
+                "dec": dec[order],
+            }
+            names = {}
+            for row, i in enumerate(order):
+                aliases = rows[i]["aliases"].split(";") if rows[i]["aliases"] else []
+                for name in [rows[i]["name"]] + aliases:
+                    names.setdefault(Catalog.normalize(name), row)
+
+            Catalog._names = names
+            Catalog._table = table
+            Logging.info(
+                f"{len(rows)} sources loaded in {perf_counter() - start:.3f}s",
+                "Catalog",
+            )
+            return table
+
+    @staticmethod
+    def entry(table: dict, row: int, **extra) -> dict:
+        return {
+            "name": str(table["name"][row]),
+            "kind": str(table["kind"][row]),
+            "ra": float(table["ra"][row]),
+            "dec": float(table["dec"][row]),
+            **extra,
+        }
+
+    @staticmethod
+    def resolve(name: str) -> dict | None:
+        """Looks up a source by name or alias, ignoring case, spaces and dashes"""
+        table = Catalog.load()
+        row = Catalog._names.get(Catalog.normalize(name))
+        return None if row is None else Catalog.entry(table, row)
+
+    @staticmethod
+    def altitude(ra, dec, lst: float, lat: float):
+        """Geometric altitude in deg from the local sidereal time, no refraction"""
+        ha = np.radians(lst - ra)
+        dec, lat = np.radians(dec), np.radians(lat)
+        sin_alt = np.sin(lat) * np.sin(dec) + np.cos(lat) * np.cos(dec) * np.cos(ha)
+        return np.degrees(np.arcsin(np.clip(sin_alt, -1.0, 1.0)))
+
+    @staticmethod
+    def radec(alt: float, az: float, lst: float, lat: float) -> tuple:
+        """Inverse of altitude(), az measured from north through east"""
+        alt, az, lat = np.radians(alt), np.radians(az), np.radians(lat)
+        sin_dec = np.sin(lat) * np.sin(alt) + np.cos(lat) * np.cos(alt) * np.cos(az)
+        dec = np.arcsin(np.clip(sin_dec, -1.0, 1.0))
+        ha = np.arctan2(
+            -np.sin(az) * np.cos(alt),
+            np.cos(lat) * np.sin(alt) - np.sin(lat) * np.cos(alt) * np.cos(az),
+        )
+        return float((lst - np.degrees(ha)) % 360.0), float(np.degrees(dec))
+
+    @staticmethod
+    def search(
+        ra: float | None = None,
+        dec: float | None = None,
+        radius: float | None = None,
+        min_alt: float | None = None,
+        lst: float | None = None,
+        lat: float | None = None,
+        kind: str | None = None,
+        limit: int | None = None,
+    ) -> list:
+        """Sources within radius deg of ra/dec and above min_alt, nearest first"""
+        table = Catalog.load()
+        lo, hi = 0, len(table["dec"])
+        if radius is not None and dec is not None:
+            # only the declination band can be within radius
+            lo = np.searchsorted(table["dec"], dec - radius, side="left")
+            hi = np.searchsorted(table["dec"], dec + radius, side="right")
+        rows = np.arange(lo, hi)
+
+        distance = None
+        if ra is not None and dec is not None:
+            d1, d2 = np.radians(dec), np.radians(table["dec"][rows])
+            dra = np.radians(table["ra"][rows] - ra)
+            hav = (
+                np.sin((d2 - d1) / 2) ** 2
+                + np.cos(d1) * np.cos(d2) * np.sin(dra / 2) ** 2
+            )
+            distance = np.degrees(2 * np.arcsin(np.sqrt(np.clip(hav, 0.0, 1.0))))
+        alt = None
+        if lst is not None and lat is not None:
+            alt = Catalog.altitude(table["ra"][rows], table["dec"][rows], lst, lat)
+
+        mask = np.ones(len(rows), dtype=bool)
+        if radius is not None and distance is not None:
+            mask &= distance <= radius
+        if min_alt is not None and alt is not None:
+            mask &= alt >= min_alt
+        if kind is not None:
+            mask &= table["kind"][rows] == kind
+
+        selected = np.nonzero(mask)[0]
+        if distance is not None:
+            selected = selected[np.argsort(distance[selected], kind="stable")]
+        elif alt is not None:
+            selected = selected[np.argsort(-alt[selected], kind="stable")]
+        if limit is not None:
+            selected = selected[:limit]
+
+        return [
+            Catalog.entry(
+                table,
+                rows[i],
+                distance=None if distance is None else round(float(distance[i]), 4),
+                alt=None if alt is None else round(float(alt[i]), 3),
+            )
+            for i in selected
+        ]
@@ -0,0 +1,85 @@
+class AxisController:
+    """PID position controller with velocity feedforward for one mount axis.
+
+    Positions are in degrees, rates in degrees per second and the output is a
+    signed PWM duty in [-max_output, max_output] (sign is the direction).
+    A wrapping axis (azimuth, wrap=360) steers the short way around.
+    """
+
+    def __init__(
+        self,
+        kp: float,
+        ki: float = 0.0,
+        kd: float = 0.0,
+        kv: float = 0.0,
+        max_output: float = 1.0,
+        min_output: float = 0.0,
+        max_accel: float = 2.0,
+        deadband: float = 0.5,
+        wrap: float | None = None,
+    ):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.kv = kv  # feedforward, output per deg/s of setpoint rate
+        self.max_output = max_output
+        self.min_output = min_output  # smallest duty that moves the motor
+        self.max_accel = max_accel  # max output change per second
+        self.deadband = deadband  # degrees
+        self.wrap = wrap  # period in degrees of a circular axis, None if linear
+
+        self.reset()
+
+    def reset(self):
+        self.__integral = 0.0
+        self.__last_position = None
+        self.output = 0.0
+        self.error = None
+
+    def hold(self):
+        """Drops the output to zero at once, e.g. when the target is reached"""
+        self.__integral = 0.0
+        self.output = 0.0
+
+    def update(
+        self,
+        setpoint: float,
+        rate: float,
+        position: float,
+        dt: float,
+        velocity: float | None = None,
+    ):
+        """Returns the new signed output for the given setpoint and position,
+        velocity is the measured axis speed when a sensor provides one"""
+        error = float(setpoint - position)
+        if self.wrap is not None:  # 359.5 seen from 0.5 is 1 deg back, not 359 on
+            error = (error + self.wrap / 2) % self.wrap - self.wrap / 2
+        self.error = error
+
+        derivative = 0.0
+        if velocity is not None:
+            derivative = -velocity
+        elif self.__last_position is not None and dt > 0:
+            # derivative on measurement, no kick when the setpoint jumps
+            delta = position - self.__last_position
+            if self.wrap is not None:
+                delta = (delta + self.wrap / 2) % self.wrap - self.wrap / 2
+            derivative = -delta / dt
+        self.__last_position = position
+
+        if abs(error) <= self.deadband:
+            self.__integral = 0.0
+            target = self.kv * rate
+        else:
+            target = self.kv * rate + self.kp * error + self.kd * derivative
+            if abs(target) < self.max_output:  # no windup while saturated
+                self.__integral += error * dt
+            target += self.ki * self.__integral
+            if 0 < abs(target) < self.min_output:
+                target = self.min_output if target > 0 else -self.min_output
+
+        target = max(-self.max_output, min(self.max_output, target))
+
+        step = self.max_accel * dt
+        self.output += max(-step, min(step, target - self.output))
+        return self.output
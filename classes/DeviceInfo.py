@@ -1,63 +1,61 @@
-import re
-import subprocess
-from drivers.Monitor import Monitor
-from SessionProperties import SessionProperties as SP
-from drivers.Radiotelescope import Radiotelescope
+import os
+import importlib
+from drivers.HardwareProbe import HardwareProbe
 
 
 class DeviceInfo:
+    # mount class per board, imported only for the board the server runs on
+    DRIVERS = {
+        "Radiotelescope": ("drivers.Radiotelescope", "Radiotelescope"),
+        "Monitor": ("drivers.Monitor", "Monitor"),
+    }
+    BOARDS = {
+        "Pi4": "Radiotelescope",
+        "Pi5": "Radiotelescope",
+        "Pi3": "Monitor",
+        "Pi02": "Monitor",
+        "Pi0": "Monitor",
+    }
 
     @staticmethod
     def get_serial():
-        try:
-            with open("/proc/cpuinfo", "r") as f:
-                for line in f:
-                    if line.startswith("Serial"):
-                        return line.split(":")[1].strip()
-        except:
-            return "unknownserial"
+        return HardwareProbe.probe()["serial"]
 
     @staticmethod
     def get_model_raw():
-        try:
-            return (
-                subprocess.check_output(["cat", "/proc/device-tree/model"])
-                .decode()
-                .strip()
-            )
-        except:
-            return "unknown"
+        return HardwareProbe.probe()["model"]
 
     @staticmethod
     def parse_model(model_raw: str):
-        match_model = re.search(r"Pi\s*([0-9]+)", model_raw)
-        pi_number = match_model.group(1) if match_model else "X"
-        match_rev = re.search(r"Rev\s*([0-9\.]+)", model_raw)
-        revision = match_rev.group(1) if match_rev else "X"
-
-        return f"Pi{pi_number}", revision
+        return HardwareProbe.parse_model(model_raw)
 
     @staticmethod
     def get_identifier():
-        serial = DeviceInfo.get_serial()
-        raw = DeviceInfo.get_model_raw()
-
-        pi_model, pi_rev = DeviceInfo.parse_model(raw)
-
-        return f"{serial}_{pi_model}_{pi_rev}"
+        probe = HardwareProbe.probe()
+        return f"{probe['serial']}_{probe['board']}_{probe['revision']}"
 
     @staticmethod
-    def select_mount():
-        if not SP().DEVICE_ID or "_" not in SP().DEVICE_ID:
-            return Radiotelescope()  # fallback
-
-        parts = SP().DEVICE_ID.split("_")
-        model = parts[1]
+    def get_driver(name: str):
+        module, cls = DeviceInfo.DRIVERS[name]
+        return getattr(importlib.import_module(module), cls)
 
-        if model in ["Pi4", "Pi5"]:
-            return Radiotelescope()
+    @staticmethod
+    def simulated() -> bool:
+        return (
+            os.environ.get("SERVER_SIMULATE", "0") != "0"
+            or not HardwareProbe.probe()["is_rpi"]  # nothing to drive
+        )
 
-        if model in ["Pi3", "Pi02", "Pi0"]:
-            return Monitor()
+    @staticmethod
+    def mount_name() -> str:
+        """Driver of this board, known without building the mount"""
+        if DeviceInfo.simulated():
+            return "Radiotelescope"
+        return DeviceInfo.BOARDS.get(HardwareProbe.probe()["board"], "Radiotelescope")
 
-        return Radiotelescope()
+    @staticmethod
+    def select_mount():
+        # only the selected driver is imported, astropy loads with it. The board
+        # comes from the cached probe, the session clears DEVICE_ID on release
+        driver = DeviceInfo.get_driver(DeviceInfo.mount_name())
+        return driver(simulated=True) if DeviceInfo.simulated() else driver()
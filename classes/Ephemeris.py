@@ -0,0 +1,118 @@
+import threading
+import numpy as np
+from time import time
+from astropy.time import Time
+from classes.Logging import Logging
+from classes.Metrics import TRANSFORMS
+from astropy.coordinates import AltAz
+from astropy.coordinates import SkyCoord
+from astropy.coordinates import EarthLocation
+
+
+class Ephemeris:
+    """Alt/az table of a target over a time grid, interpolated on every tick"""
+
+    def __init__(
+        self,
+        target: SkyCoord,
+        location: EarthLocation,
+        span: float = 600.0,
+        step: float = 1.0,
+        refill: float = 0.25,
+    ):
+        self.SPAN_S = span  # table length in seconds
+        self.STEP_S = step  # grid spacing in seconds
+        self.REFILL = refill  # refill when less than this fraction of span is left
+        self.ERROR_SAMPLES = 16  # midpoints checked against the exact transform
+
+        self.__target = target
+        self.__location = location
+        self.__table = None  # (times, az unwrapped, alt, rates), swapped atomically
+        self.__error = None
+        self.__lock = threading.Lock()  # guards the refill thread only
+        self.__refilling = None
+
+        self.__table = self.__build(time())
+
+    @TRANSFORMS.time(op="ephemeris")
+    def __transform(self, times: np.ndarray):
+        altaz_frame = AltAz(
+            obstime=Time(times, format="unix"), location=self.__location
+        )
+        altaz_coords = self.__target.transform_to(altaz_frame)
+        return altaz_coords.az.deg, altaz_coords.alt.deg
+
+    def __build(self, start: float):
+        times = start + np.arange(0.0, self.SPAN_S + self.STEP_S, self.STEP_S)
+        az, alt = self.__transform(times)
+        az = np.unwrap(az, period=360.0)
+
+        # interpolation error against the exact transform at grid midpoints
+        idx = np.linspace(0, len(times) - 2, self.ERROR_SAMPLES).astype(int)
+        mid = (times[idx] + times[idx + 1]) / 2
+        az_exact, alt_exact = self.__transform(mid)
+        az_interp = np.interp(mid, times, az) % 360.0
+        alt_interp = np.interp(mid, times, alt)
+        az_err = (az_interp - az_exact + 180.0) % 360.0 - 180.0
+        az_err *= np.cos(np.radians(alt_exact))  # on-sky azimuth error
+        err = np.hypot(az_err, alt_interp - alt_exact)
+        self.__error = {
+            "max": float(err.max()),
+            "rms": float(np.sqrt(np.mean(err**2))),
+        }
+        Logging.info(
+            f"{len(times)} points over {self.SPAN_S:.0f}s, "
+            f"interpolation error max {self.__error['max'] * 3600:.3f}\" "
+            f"rms {self.__error['rms'] * 3600:.3f}\"",
+            "Ephemeris",
+        )
+
+        az_rate = np.gradient(az, times)
+        alt_rate = np.gradient(alt, times)
+        return times, az, alt, az_rate, alt_rate
+
+    def __refill(self, start: float):
+        try:
+            self.__table = self.__build(start)
+        except Exception as e:
+            Logging.error(f"Error refilling table: {e}", "Ephemeris")
+        finally:
+            with self.__lock:
+                self.__refilling = None
+
+    def __maybe_refill(self, t: float, times: np.ndarray):
+        if times[-1] - t > self.SPAN_S * self.REFILL:
+            return
+        with self.__lock:
+            if self.__refilling is not None:
+                return
+            self.__refilling = threading.Thread(
+                target=self.__refill, args=(t,), daemon=True
+            )
+            self.__refilling.start()
+
+    def __table_at(self, t: float):
+        table = self.__table
+        times = table[0]
+        if t < times[0] or t > times[-1]:
+            # the background refill did not make it in time
+            self.__table = table = self.__build(t)
+        else:
+            self.__maybe_refill(t, times)
+        return table
+
+    def at(self, t: float | None = None) -> tuple[float, float]:
+        """Returns the interpolated (az, alt) in degrees at unix time t"""
+        t = time() if t is None else t
+        times, az, alt, _, _ = self.__table_at(t)
+        return float(np.interp(t, times, az) % 360.0), float(np.interp(t, times, alt))
+
+    def rate_at(self, t: float | None = None) -> tuple[float, float]:
+        """Returns the interpolated (az, alt) rates in degrees/s at unix time t"""
+        t = time() if t is None else t
+        times, _, _, az_rate, alt_rate = self.__table_at(t)
+        return float(np.interp(t, times, az_rate)), float(np.interp(t, times, alt_rate))
+
+    def get_error(self):
+        """Returns the last measured interpolation error in degrees"""
+        return self.__error
@@ -0,0 +1,170 @@
+import json
+import uuid
+import queue
+import asyncio
+import threading
+import http.client
+from time import monotonic
+from concurrent.futures import ThreadPoolExecutor
+from classes.Logging import Logging
+
+
+class Node:
+    """One telescope server, its session and a pool of keep-alive connections"""
+
+    def __init__(self, name: str, host: str, port: int, pool: int = 4):
+        self.TIMEOUT_S = 5.0  # per request, connect included
+
+        self.name = name
+        self.host = host
+        self.port = port
+        self.sid = None
+        self.__idle = queue.LifoQueue(pool)  # warmest connection first
+        self.__session_lock = threading.Lock()
+
+    def __connection(self):
+        try:
+            return self.__idle.get_nowait(), True
+        except queue.Empty:
+            conn = http.client.HTTPConnection(
+                self.host, self.port, timeout=self.TIMEOUT_S
+            )
+            return conn, False
+
+    def __release(self, conn, response) -> None:
+        if response.will_close:
+            conn.close()
+            return
+        try:
+            self.__idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def __send(self, method: str, path: str, body=None, auth: bool = True):
+        headers = {"Content-Type": "application/json"}
+        if auth and self.sid:
+            headers["Authorization"] = self.sid
+        payload = None if body is None else json.dumps(body)
+        while True:
+            conn, reused = self.__connection()
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                if reused:  # the server dropped an idle connection, retry fresh
+                    continue
+                raise
+            self.__release(conn, response)
+            try:
+                return response.status, json.loads(data) if data else None
+            except ValueError:
+                return response.status, None
+
+    def acquire(self) -> None:
+        """Holds the node session, raises if someone else has it"""
+        with self.__session_lock:
+            if self.sid:
+                return
+            status, data = self.__send("GET", "/session/acquire", auth=False)
+            if status != 200:
+                message = (data or {}).get("message") or (data or {}).get("error")
+                raise RuntimeError(f"cannot acquire session: {message or status}")
+            self.sid = data["session_id"]
+            Logging.info(f"Session {self.sid} on {self.name}", "Gateway")
+
+    def release(self) -> None:
+        with self.__session_lock:
+            if self.sid:
+                self.__send("GET", "/session/release")
+                self.sid = None
+
+    def call(self, method: str, path: str, body=None) -> dict:
+        """One request in the node session, with its latency and outcome"""
+        start = monotonic()
+        result = {"node": self.name, "status": None, "response": None, "error": None}
+        try:
+            self.acquire()
+            status, data = self.__send(method, path, body)
+            if status == 401:  # the node restarted and lost our session
+                self.sid = None
+                self.acquire()
+                status, data = self.__send(method, path, body)
+            result["status"], result["response"] = status, data
+            if status >= 400:
+                result["error"] = (data or {}).get("error") or f"HTTP {status}"
+        except Exception as e:
+            result["error"] = str(e)
+        result["latency_ms"] = round((monotonic() - start) * 1e3, 2)
+        return result
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "host": self.host,
+            "port": self.port,
+            "session": self.sid is not None,
+        }
+
+
+class Gateway:
+    """Registry of nodes, sending every call to all of them concurrently"""
+
+    def __init__(self, pool: int = 4):
+        self.POOL = pool  # keep-alive connections per node
+
+        self.__nodes = {}  # name -> node, registration order
+        self.sid = None  # gateway session, the nodes have their own
+        self.__session_lock = threading.Lock()
+        self.__executor = ThreadPoolExecutor(max_workers=32)
+        self.__loop = asyncio.new_event_loop()
+        self.__loop.set_default_executor(self.__executor)
+        threading.Thread(target=self.__loop.run_forever, daemon=True).start()
+
+    def add(self, host: str, port: int = 56361, name: str | None = None) -> Node:
+        node = Node(name or f"{host}:{port}", host, port, self.POOL)
+        self.__nodes[node.name] = node
+        return node
+
+    def get_nodes(self) -> list:
+        return list(self.__nodes.values())
+
+    def acquire(self) -> str | None:
+        """Opens the gateway session, None when it is already held"""
+        with self.__session_lock:
+            if self.sid:
+                return None
+            self.sid = str(uuid.uuid4())
+            Logging.info(f"Gateway session {self.sid}", "Gateway")
+            return self.sid
+
+    def release(self) -> bool:
+        with self.__session_lock:
+            if not self.sid:
+                return False
+            self.sid = None
+            return True
+
+    async def __gather(self, method: str, path: str, body) -> list:
+        return await asyncio.gather(
+            *(
+                asyncio.to_thread(node.call, method, path, body)
+                for node in self.__nodes.values()
+            )
+        )
+
+    def fan_out(self, method: str, path: str, body=None) -> list:
+        """Same request to every node at once, results in registration order"""
+        future = asyncio.run_coroutine_threadsafe(
+            self.__gather(method, path, body), self.__loop
+        )
+        return future.result()
+
+    def shutdown(self) -> None:
+        """Releases the node sessions"""
+        for node in self.__nodes.values():
+            try:
+                node.release()
+            except Exception as e:
+                Logging.warning(f"Cannot release {node.name}: {e}", "Gateway")
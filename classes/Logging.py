@@ -1,22 +1,156 @@
 import os
+import sys
+import json
+import queue
+import atexit
 import threading
+from time import time
+from time import monotonic
 from datetime import datetime
 
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
 
 class Logging:
     _folder = "logs"
-    _lock = threading.Lock()
+    _level = LEVELS.get(os.environ.get("LOG_LEVEL", "INFO").upper(), 20)
+    _format = os.environ.get("LOG_FORMAT", "text")  # "text" or "jsonl"
+    _stdout = os.environ.get("LOG_STDOUT", "1") != "0"
+    _rate_limit = int(os.environ.get("LOG_RATE", 20))  # messages/s per module
+    _batch = 256  # messages written per wake-up at most
+
+    _queue = queue.SimpleQueue()  # put() never blocks the caller
+    _rates = {}  # module -> [window start, count, suppressed]
+    _writer = None
+    _writer_lock = threading.Lock()
+    _file = None
+    _day = None
 
     @staticmethod
-    def log(message: str):
-        os.makedirs(Logging._folder, exist_ok=True)  # ensure folder exists
+    def log(message: str, level: str = "INFO", module: str | None = None):
+        if LEVELS[level] < Logging._level:
+            return
+        suppressed = 0
+        if module is not None and level != "ERROR":
+            rate = Logging._rates.get(module)
+            now = monotonic()
+            if rate is None or now - rate[0] >= 1.0:
+                suppressed = rate[2] if rate is not None else 0
+                Logging._rates[module] = [now, 1, 0]
+            elif rate[1] >= Logging._rate_limit:
+                rate[2] += 1
+                return
+            else:
+                rate[1] += 1
+        if Logging._writer is None:
+            Logging._start()
+        Logging._queue.put((time(), level, module, message, suppressed))
+
+    @staticmethod
+    def debug(message: str, module: str | None = None):
+        Logging.log(message, "DEBUG", module)
+
+    @staticmethod
+    def info(message: str, module: str | None = None):
+        Logging.log(message, "INFO", module)
+
+    @staticmethod
+    def warning(message: str, module: str | None = None):
+        Logging.log(message, "WARNING", module)
+
+    @staticmethod
+    def error(message: str, module: str | None = None):
+        Logging.log(message, "ERROR", module)
 
-        filename = datetime.now().strftime("%Y%m%d") + ".txt"  # daily file name
-        path = os.path.join(Logging._folder, filename)
+    @staticmethod
+    def flush(timeout: float = 2.0):
+        """Waits until everything queued so far is on disk"""
+        if Logging._writer is None:
+            return
+        done = threading.Event()
+        Logging._queue.put(done)
+        done.wait(timeout)
+
+    @staticmethod
+    def _start():
+        with Logging._writer_lock:
+            if Logging._writer is None:
+                Logging._writer = threading.Thread(
+                    target=Logging._write_loop, daemon=True
+                )
+                Logging._writer.start()
+                atexit.register(Logging.flush)
 
-        now = datetime.now()
+    @staticmethod
+    def _format_record(record) -> str:
+        timestamp, level, module, message, suppressed = record
+        if suppressed:
+            message = f"{message} ({suppressed} similar messages suppressed)"
+        if Logging._format == "jsonl":
+            return json.dumps(
+                {
+                    "t": round(timestamp, 3),
+                    "level": level,
+                    "module": module,
+                    "msg": message,
+                },
+                separators=(",", ":"),
+            )
+        now = datetime.fromtimestamp(timestamp)
         ts = now.strftime("%Y-%m-%d %H:%M:%S") + f".{now.microsecond // 1000:03d}"
+        tag = f" [{module}]" if module else ""
+        return f"[{ts}] {level}{tag} {message}"
 
-        with Logging._lock:
-            with open(path, "a", encoding="utf-8") as f:
-                f.write(f"[{ts}] {message}\n")
+    @staticmethod
+    def _open(day: str):
+        if Logging._file is not None:
+            Logging._file.close()
+        os.makedirs(Logging._folder, exist_ok=True)  # ensure folder exists
+        ext = "jsonl" if Logging._format == "jsonl" else "txt"
+        path = os.path.join(Logging._folder, f"{day}.{ext}")  # daily file name
+        Logging._file = open(path, "a", encoding="utf-8")
+        Logging._day = day
+
+    @staticmethod
+    def _write_loop():
+        while True:
+            batch = [Logging._queue.get()]
+            while len(batch) < Logging._batch:
+                try:
+                    batch.append(Logging._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines, waiters = [], []
+            for record in batch:
+                if isinstance(record, threading.Event):
+                    waiters.append(record)
+                    continue
+                day = datetime.fromtimestamp(record[0]).strftime("%Y%m%d")
+                if day != Logging._day:
+                    Logging._write(lines)
+                    lines = []
+                    try:
+                        Logging._open(day)
+                    except Exception as e:
+                        sys.stderr.write(f"[Logging] Error opening log file: {e}\n")
+                        Logging._file, Logging._day = None, day
+                lines.append(Logging._format_record(record))
+            Logging._write(lines)
+            for waiter in waiters:
+                waiter.set()
+
+    @staticmethod
+    def _write(lines: list):
+        if not lines:
+            return
+        text = "\n".join(lines) + "\n"
+        try:
+            if Logging._file is not None:
+                Logging._file.write(text)
+                Logging._file.flush()
+        except Exception as e:
+            sys.stderr.write(f"[Logging] Error writing log file: {e}\n")
+        if Logging._stdout:
+            sys.stdout.write(text)
+            sys.stdout.flush()
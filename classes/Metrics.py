@@ -0,0 +1,231 @@
+import threading
+from functools import wraps
+from bisect import bisect_left
+from time import perf_counter
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def selector(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """Monotonic count per label values"""
+
+    TYPE = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.__values = {}  # label values -> count
+        self.__lock = threading.Lock()
+
+    def definition(self) -> tuple:
+        return (self.TYPE, self.help, self.labels)
+
+    def inc(self, value: float = 1, **labels) -> None:
+        self.add(tuple(map(labels.__getitem__, self.labels)), value)
+
+    def add(self, key: tuple, value: float = 1) -> None:
+        with self.__lock:
+            self.__values[key] = self.__values.get(key, 0) + value
+
+    def bind(self, **labels):
+        """inc with the labels resolved once, for the hot paths"""
+        key = tuple(map(labels.__getitem__, self.labels))
+        return lambda value=1: self.add(key, value)
+
+    def lines(self) -> list:
+        with self.__lock:
+            values = sorted(self.__values.items())
+        return [f"{self.name}{selector(self.labels, k)} {number(v)}" for k, v in values]
+
+
+class Timer:
+    """Context manager and decorator observing the seconds spent inside"""
+
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(perf_counter() - self.start, **self.labels)
+        return False
+
+    def __call__(self, fn):
+        histogram, labels = self.histogram, self.labels
+
+        @wraps(fn)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(perf_counter() - start, **labels)
+
+        return timed
+
+
+class Histogram:
+    """Counts per fixed bucket, with the sum, per label values"""
+
+    TYPE = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self.__values = {}  # label values -> [count per bucket..., +Inf, sum]
+        self.__lock = threading.Lock()
+
+    def definition(self) -> tuple:
+        return (self.TYPE, self.help, self.labels, self.buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        self.add(tuple(map(labels.__getitem__, self.labels)), value)
+
+    def bind(self, **labels):
+        """observe with the labels resolved once, for the hot paths"""
+        key = tuple(map(labels.__getitem__, self.labels))
+        return lambda value: self.add(key, value)
+
+    def add(self, key: tuple, value: float) -> None:
+        index = bisect_left(self.buckets, value)  # first bucket with le >= value
+        with self.__lock:
+            counts = self.__values.get(key)
+            if counts is None:
+                counts = self.__values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def time(self, **labels) -> Timer:
+        return Timer(self, labels)
+
+    def lines(self) -> list:
+        with self.__lock:
+            values = sorted((k, list(v)) for k, v in self.__values.items())
+        lines = []
+        for key, counts in values:
+            total = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts[:-1]):
+                total += count
+                le = bound if bound == "+Inf" else number(bound)
+                lines.append(
+                    f"{self.name}_bucket"
+                    f"{selector((*self.labels, 'le'), (*key, le))} {total}"
+                )
+            labels = selector(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {number(counts[-1])}")
+            lines.append(f"{self.name}_count{labels} {total}")
+        return lines
+
+
+class Metrics:
+    """Process wide registry, rendered in the Prometheus text format"""
+
+    LATENCY_BUCKETS = (
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+    )
+    TICK_BUCKETS = (
+        0.015,
+        0.018,
+        0.019,
+        0.0195,
+        0.02,
+        0.0205,
+        0.021,
+        0.022,
+        0.025,
+        0.03,
+        0.05,
+        0.1,
+    )
+
+    _registry = {}  # name -> metric, registration order
+    _lock = threading.Lock()
+
+    @staticmethod
+    def __register(cls, name: str, *args):
+        metric = cls(name, *args)
+        with Metrics._lock:
+            existing = Metrics._registry.setdefault(name, metric)
+        if existing is not metric and existing.definition() != metric.definition():
+            raise ValueError(f"{name} is already registered as {existing.definition()}")
+        return existing
+
+    @staticmethod
+    def counter(name: str, help: str, labels: tuple = ()) -> Counter:
+        return Metrics.__register(Counter, name, help, labels)
+
+    @staticmethod
+    def histogram(
+        name: str, help: str, buckets: tuple = LATENCY_BUCKETS, labels: tuple = ()
+    ) -> Histogram:
+        return Metrics.__register(Histogram, name, help, buckets, labels)
+
+    @staticmethod
+    def render() -> str:
+        with Metrics._lock:
+            metrics = list(Metrics._registry.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.TYPE}")
+            lines.extend(metric.lines())
+        return "\n".join(lines) + "\n"
+
+
+# every metric of the server, defined here once and imported where it is updated
+HTTP_REQUESTS = Metrics.histogram(
+    "http_request_duration_seconds",
+    "Request handling time by route",
+    labels=("route", "method", "status"),
+)
+MOUNT_TICKS = Metrics.histogram(
+    "mount_tick_seconds",
+    "Period of the motion loop ticks",
+    Metrics.TICK_BUCKETS,
+    ("loop",),
+)
+MOUNT_OVERRUNS = Metrics.counter(
+    "mount_tick_overruns_total", "Motion loop ticks started late", ("loop",)
+)
+MOUNT_RUNS = Metrics.counter("mount_runs_total", "Finished runs", ("bh", "status"))
+TRANSFORMS = Metrics.histogram(
+    "astropy_transform_seconds", "Coordinate transform time by caller", labels=("op",)
+)
+I2C_TRANSFERS = Metrics.counter(
+    "i2c_transfers_total", "I2C transactions by device", ("device",)
+)
+I2C_ERRORS = Metrics.counter(
+    "i2c_errors_total", "Failed I2C transactions by device", ("device",)
+)
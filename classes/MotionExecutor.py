@@ -0,0 +1,141 @@
+import queue
+import itertools
+import threading
+from time import time
+from collections import OrderedDict
+from classes.Logging import Logging
+from classes.Metrics import MOUNT_RUNS
+
+
+class RunHandle:
+    """Status and future of one submitted run"""
+
+    def __init__(self, run_id: int, bh: str, params: dict, prepare=None):
+        self.id = run_id
+        self.bh = bh
+        self.params = params
+        self.prepare = prepare  # called on the executor thread just before run
+        self.status = "queued"  # queued, running, done, cancelled, failed
+        self.error = None
+        self.submitted = time()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()  # handed to Mount.run
+        self.__done = threading.Event()
+
+    def done(self) -> bool:
+        return self.__done.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Blocks until the run has finished, returns False on timeout"""
+        return self.__done.wait(timeout)
+
+    def finish(self, status: str, error: str | None = None) -> None:
+        self.status = status
+        self.error = error
+        self.finished = time()
+        self.__done.set()
+
+    def to_dict(self) -> dict:
+        return {
+            "run_id": self.id,
+            "bh": self.bh,
+            "params": self.params,
+            "status": self.status,
+            "error": self.error,
+            "submitted": round(self.submitted, 3),
+            "started": None if self.started is None else round(self.started, 3),
+            "finished": None if self.finished is None else round(self.finished, 3),
+        }
+
+
+class MotionExecutor:
+    """The one thread that runs a mount's behaviors, in submission order"""
+
+    def __init__(self, mount, history: int = 32):
+        self.HISTORY = history  # finished runs kept for the status endpoint
+
+        self.__mount = mount
+        self.__queue = queue.Queue()
+        self.__lock = threading.Lock()
+        self.__ids = itertools.count(1)
+        self.__runs = OrderedDict()  # run id -> handle
+        self.__pending = 0
+        self.__current = None
+
+        threading.Thread(target=self.__loop, daemon=True).start()
+
+    def busy(self) -> bool:
+        return self.__current is not None or self.__pending > 0
+
+    def submit(
+        self, bh: str, params: dict | None = None, prepare=None, wait: bool = False
+    ) -> RunHandle:
+        """Queues a run; unless wait is set, refuses it while another is active"""
+        with self.__lock:
+            if not wait and self.busy():
+                raise RuntimeError("already moving")
+            handle = RunHandle(next(self.__ids), bh, params or {}, prepare)
+            self.__runs[handle.id] = handle
+            while len(self.__runs) > self.HISTORY:
+                oldest = next(iter(self.__runs.values()))
+                if not oldest.done():
+                    break
+                self.__runs.popitem(last=False)
+            self.__pending += 1
+        self.__queue.put(handle)
+        return handle
+
+    def cancel(self, run_id: int | None = None) -> bool:
+        """Cancels one run, or the current and all queued ones; True if any"""
+        with self.__lock:
+            handles = [
+                h
+                for h in self.__runs.values()
+                if not h.done() and (run_id is None or h.id == run_id)
+            ]
+            current = self.__current
+        for handle in handles:
+            if handle is current:
+                self.__mount.stop()  # motors first, then the run unwinds
+            handle.cancel_event.set()
+        return bool(handles)
+
+    def get_run(self, run_id: int) -> RunHandle | None:
+        return self.__runs.get(run_id)
+
+    def get_runs(self) -> list:
+        with self.__lock:
+            return list(self.__runs.values())
+
+    def __loop(self) -> None:
+        while True:
+            handle = self.__queue.get()
+            with self.__lock:
+                self.__pending -= 1
+                if handle.cancel_event.is_set():
+                    handle.finish("cancelled")
+                    MOUNT_RUNS.inc(bh=handle.bh, status="cancelled")
+                    continue
+                self.__current = handle
+                handle.status = "running"
+                handle.started = time()
+
+            status, error = "done", None
+            try:
+                if handle.prepare is not None:
+                    handle.prepare()
+                if not handle.cancel_event.is_set():
+                    self.__mount.run(
+                        handle.bh, cancel=handle.cancel_event, **handle.params
+                    )
+            except Exception as e:
+                status, error = "failed", str(e)
+                Logging.error(f"Run {handle.id} {handle.bh} failed: {e}", "Executor")
+            if status == "done" and handle.cancel_event.is_set():
+                status = "cancelled"
+
+            with self.__lock:
+                self.__current = None
+                handle.finish(status, error)
+            MOUNT_RUNS.inc(bh=handle.bh, status=status)
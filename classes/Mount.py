@@ -1,7 +1,12 @@
+import threading
 from abc import ABC, abstractmethod
+from classes.MountState import MountState
+from classes.MotionExecutor import MotionExecutor
 
 
 class Mount(ABC):
+    _executor_lock = threading.Lock()
+
     @abstractmethod
     def get_location(self):
         raise NotImplementedError
@@ -18,6 +23,9 @@ class Mount(ABC):
     def get_position(self):
         raise NotImplementedError
 
+    def get_state(self) -> MountState:
+        return MountState.from_mount(self)
+
     @abstractmethod
     def get_behavior(self):
         raise NotImplementedError
@@ -26,6 +34,11 @@ class Mount(ABC):
     def get_running(self):
         raise NotImplementedError
 
+    def get_on_target(self) -> bool | None:
+        """True once the running behavior holds its setpoint, None when the
+        mount cannot tell"""
+        return None
+
     @abstractmethod
     def set_location(self, location):
         raise NotImplementedError
@@ -43,9 +56,25 @@ class Mount(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def run(self, bh: str) -> None:
+    def run(self, bh: str, cancel: threading.Event | None = None, **params) -> None:
+        """Blocks until the behavior ends or cancel is set"""
         raise NotImplementedError
 
+    def get_executor(self) -> MotionExecutor:
+        """The single executor every run of this mount goes through"""
+        if getattr(self, "_executor", None) is None:
+            with Mount._executor_lock:
+                if getattr(self, "_executor", None) is None:
+                    self._executor = MotionExecutor(self)
+        return self._executor
+
     @abstractmethod
     def stop(self) -> None:
         raise NotImplementedError
+
+    def shutdown(self) -> None:
+        """Leaves the hardware safe before the process exits"""
+        executor = getattr(self, "_executor", None)
+        if executor is not None:
+            executor.cancel()
+        self.stop()
@@ -0,0 +1,96 @@
+import json
+import hashlib
+from functools import cached_property
+from dataclasses import dataclass, replace
+
+
+@dataclass(frozen=True)
+class MountState:
+    """Immutable snapshot of a mount, swapped in whole by the writers"""
+
+    version: int = 0
+    location: tuple | None = None  # (lat, lon, height) in deg, deg, m
+    target: tuple | None = None  # (ra, dec) in deg
+    offset: tuple | None = None  # (ra, dec) in deg
+    position: tuple | None = None  # (alt, az) in deg
+    tracking_error: tuple | None = None  # (az, alt) in deg
+    behavior: str | None = None
+    running: bool = False
+
+    def evolve(self, **changes) -> "MountState":
+        """Returns the next version, or self when nothing changed"""
+        if all(getattr(self, k) == v for k, v in changes.items()):
+            return self
+        return replace(self, version=self.version + 1, **changes)
+
+    def to_dict(self) -> dict:
+        location, target, offset = self.location, self.target, self.offset
+        position = self.position or (None, None)
+        error = self.tracking_error or (None, None)
+        return {
+            "location": (
+                None
+                if location is None
+                else {"lat": location[0], "lon": location[1], "height": location[2]}
+            ),
+            "target": {
+                "ra": None if target is None else target[0],
+                "dec": None if target is None else target[1],
+            },
+            "offset": {
+                "ra": None if offset is None else offset[0],
+                "dec": None if offset is None else offset[1],
+            },
+            "position": {"ra": position[0], "dec": position[1]},
+            "tracking_error": {"az": error[0], "alt": error[1]},
+            "bh": self.behavior,
+            "is_running": self.running,
+        }
+
+    @cached_property
+    def json(self) -> str:
+        return json.dumps(self.to_dict(), separators=(",", ":"))
+
+    @cached_property
+    def etag(self) -> str:
+        return hashlib.sha1(self.json.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def round(value, digits: int = 6):
+        return None if value is None else round(float(value), digits)
+
+    @staticmethod
+    def from_mount(mount) -> "MountState":
+        """Builds a snapshot from the getters, for mounts that do not keep one"""
+
+        def radec(coord):
+            if coord is None or getattr(coord, "ra", None) is None:
+                return None
+            return (MountState.round(coord.ra.deg), MountState.round(coord.dec.deg))
+
+        location = mount.get_location()
+        position = mount.get_position()
+        error = getattr(mount, "get_tracking_error", lambda: None)()
+        return MountState(
+            location=(
+                None
+                if location is None
+                else (
+                    MountState.round(location.lat.deg),
+                    MountState.round(location.lon.deg),
+                    MountState.round(location.height.to_value("m"), 3),
+                )
+            ),
+            target=radec(mount.get_target()),
+            offset=radec(mount.get_offset()),
+            position=(
+                None
+                if not isinstance(position, tuple)
+                else tuple(MountState.round(p) for p in position)
+            ),
+            tracking_error=(
+                None if error is None else tuple(MountState.round(e) for e in error)
+            ),
+            behavior=mount.get_behavior(),
+            running=mount.get_running(),
+        )
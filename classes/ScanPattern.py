@@ -0,0 +1,32 @@
+import numpy as np
+
+
+class ScanPattern:
+    """Sky offsets in deg around a target, ordered as one continuous sweep"""
+
+    @staticmethod
+    def raster(width: float, height: float, spacing: float):
+        """Boustrophedon rows along the first axis, spaced along the second"""
+        cols = int(round(width / spacing)) + 1
+        rows = int(round(height / spacing)) + 1
+        x = np.linspace(-width / 2, width / 2, cols)
+        y = np.linspace(-height / 2, height / 2, rows)
+        dx = np.tile(x, (rows, 1))
+        dx[1::2] = dx[1::2, ::-1]  # every other row runs backwards
+        dy = np.repeat(y, cols).reshape(rows, cols)
+        return dx.ravel(), dy.ravel()
+
+    @staticmethod
+    def spiral(radius: float, spacing: float):
+        """Archimedean spiral from the center, turns and samples spacing apart"""
+        # arc length s ~ spacing * theta² / (4 pi), sampled every spacing
+        length = np.pi * radius**2 / spacing
+        s = np.arange(0.0, length + spacing, spacing)
+        theta = np.sqrt(4 * np.pi * s / spacing)
+        r = np.minimum(spacing * theta / (2 * np.pi), radius)
+        return r * np.cos(theta), r * np.sin(theta)
+
+    @staticmethod
+    def distance(dx, dy):
+        """Path length in deg from the first sample to each sample"""
+        return np.concatenate(([0.0], np.cumsum(np.hypot(np.diff(dx), np.diff(dy)))))
@@ -0,0 +1,444 @@
+import threading
+import numpy as np
+from time import time
+from astropy import units
+from astropy.time import Time
+from dataclasses import dataclass
+from classes.Logging import Logging
+from classes.Trajectory import Trajectory
+from astropy.coordinates import AltAz
+from astropy.coordinates import SkyCoord
+from astropy.coordinates import EarthLocation
+
+
+@dataclass
+class Observation:
+    """One entry of a schedule, coordinates in deg and times in unix seconds"""
+
+    ra: float
+    dec: float
+    bh: str
+    duration: float
+    earliest: float | None = None
+    latest: float | None = None
+    offset: tuple | None = None  # (ra, dec), start of transit and route
+    index: int = 0  # position in the submitted batch
+    slew: float | None = None  # planned slew seconds
+    planned: float | None = None  # planned start, after the slew
+    status: str = "pending"
+    started: float | None = None
+    finished: float | None = None
+
+    def to_dict(self) -> dict:
+        return {
+            "index": self.index,
+            "target": {"ra": round(self.ra, 6), "dec": round(self.dec, 6)},
+            "bh": self.bh,
+            "duration": self.duration,
+            "slew": None if self.slew is None else round(self.slew, 1),
+            "planned": None if self.planned is None else round(self.planned, 1),
+            "status": self.status,
+            "started": None if self.started is None else round(self.started, 1),
+            "finished": None if self.finished is None else round(self.finished, 1),
+        }
+
+
+class Scheduler:
+    """Orders a batch of observations by slew time and runs them back to back"""
+
+    def __init__(
+        self,
+        trajectory: Trajectory | None = None,
+        grid_step: float = 60.0,
+        min_alt: float = 0.0,
+        max_passes: int = 5,
+        max_observations: int = 64,
+    ):
+        self.trajectory = Trajectory() if trajectory is None else trajectory
+        self.GRID_STEP_S = grid_step  # alt/az table spacing used for planning
+        self.MIN_ALT_DEG = min_alt  # targets below this cannot be observed
+        self.MAX_PASSES = max_passes  # 2-opt improvement rounds
+        self.MAX_OBSERVATIONS = max_observations  # largest batch accepted
+        self.MIN_GAIN_S = 0.5  # slew saved before a 2-opt move is checked
+        self.SETTLE_MARGIN_S = 10.0  # past twice the planned slew, start anyway
+
+        self.__lock = threading.Lock()
+        self.__cancel = threading.Event()
+        self.__thread = None
+        self.__mount = None
+        self.__plan = []
+        self.__current = None
+        self.__handle = None  # executor run of the current observation
+        self.__table = None  # (start, az unwrapped, alt), one row per observation
+        self.__trajectory = self.trajectory
+
+    def get_running(self) -> bool:
+        thread = self.__thread
+        return thread is not None and thread.is_alive()
+
+    def get_status(self) -> dict:
+        plan = self.__plan
+        current = self.__current
+        return {
+            "is_running": self.get_running(),
+            "current": None if current is None else current.index,
+            "observations": [o.to_dict() for o in plan],
+        }
+
+    def submit(self, mount, observations: list, optimize: bool = True) -> list:
+        """Plans the batch from the mount position and runs it, in the background"""
+        with self.__lock:
+            if self.get_running():
+                raise RuntimeError("a schedule is already running")
+            if len(observations) > self.MAX_OBSERVATIONS:
+                raise ValueError(
+                    f"at most {self.MAX_OBSERVATIONS} observations per schedule"
+                )
+            for i, observation in enumerate(observations):
+                observation.index = i
+                observation.status = "planning"
+            self.__mount = mount
+            self.__plan = list(observations)
+            self.__cancel.clear()
+            self.__thread = threading.Thread(
+                target=self.__execute, args=(observations, optimize), daemon=True
+            )
+            self.__thread.start()
+            return self.__plan
+
+    @staticmethod
+    def __position(mount) -> tuple | None:
+        # (alt, az) in deg from the published state, None when not an alt/az pair
+        position = mount.get_state().position
+        if (
+            isinstance(position, tuple)
+            and len(position) == 2
+            and all(isinstance(p, (int, float)) for p in position)
+        ):
+            return position
+        return None
+
+    def cancel(self) -> bool:
+        if not self.get_running():
+            return False
+        self.__cancel.set()
+        handle = self.__handle
+        if handle is not None:
+            self.__mount.get_executor().cancel(handle.id)
+        return True
+
+    def plan(
+        self,
+        observations: list,
+        location: EarthLocation,
+        start: float | None = None,
+        position: tuple | None = None,
+        optimize: bool = True,
+        trajectory: Trajectory | None = None,
+    ) -> list:
+        """Returns the observations in run order with their planned starts"""
+        self.__trajectory = self.trajectory if trajectory is None else trajectory
+        start = time() if start is None else start
+        for i, observation in enumerate(observations):
+            observation.index = i
+        if not observations:
+            return []
+        self.__tabulate(observations, location, start)
+
+        order = list(range(len(observations)))
+        if optimize:
+            order = self.__nearest_neighbour(observations, start, position)
+            order = self.__two_opt(observations, order, start, position)
+        _, timeline = self.__timeline(observations, order, start, position)
+
+        plan = []
+        for i, slew, planned in timeline:
+            observation = observations[i]
+            observation.slew, observation.planned = slew, planned
+            observation.status = "pending" if planned is not None else "missed"
+            plan.append(observation)
+        total = sum(o.slew for o in plan if o.slew is not None)
+        Logging.info(
+            f"{len(plan)} observations planned, {total:.0f}s of slew, "
+            f"{sum(o.planned is None for o in plan)} outside their window",
+            "Scheduler",
+        )
+        return plan
+
+    def __tabulate(self, observations: list, location: EarthLocation, start: float):
+        # one batched transform: every target over a grid that covers the night
+        durations = sum(o.duration for o in observations)
+        slews = len(observations) * self.__trajectory.duration(0.0, 0.0, 180.0, 90.0)
+        end = max(
+            [start + durations + slews]
+            + [o.earliest + o.duration for o in observations if o.earliest]
+        )
+        times = start + np.arange(
+            0.0, end - start + 2 * self.GRID_STEP_S, self.GRID_STEP_S
+        )
+        # targets as a column against the time row: the frame is built for m
+        # times instead of n * m, the transform broadcasts to (n, m)
+        altaz_frame = AltAz(obstime=Time(times, format="unix"), location=location)
+        altaz_coords = SkyCoord(
+            ra=np.array([[o.ra] for o in observations]) * units.deg,
+            dec=np.array([[o.dec] for o in observations]) * units.deg,
+            frame="icrs",
+        ).transform_to(altaz_frame)
+        az = np.unwrap(altaz_coords.az.deg, period=360.0, axis=1)
+        alt = altaz_coords.alt.deg
+        self.__table = (start, az.tolist(), alt.tolist())
+
+    def __altaz(self, i: int, t: float) -> tuple:
+        start, az, alt = self.__table
+        k = min(max((t - start) / self.GRID_STEP_S, 0.0), len(az[i]) - 1.0)
+        j = min(int(k), len(az[i]) - 2)
+        f = k - j
+        return (
+            alt[i][j] + (alt[i][j + 1] - alt[i][j]) * f,
+            (az[i][j] + (az[i][j + 1] - az[i][j]) * f) % 360.0,
+        )
+
+    def __slew(self, position: tuple | None, i: int, t: float) -> float:
+        if position is None:
+            return 0.0
+        # the target moves while slewing, so aim at where it will be
+        slew = 0.0
+        for _ in range(2):
+            alt, az = self.__altaz(i, t + slew)
+            slew = self.__trajectory.duration(position[1], position[0], az, alt)
+        return slew
+
+    def __step(self, observations, i, t, position):
+        # (slew, start, end, end position) or None when outside the window
+        observation = observations[i]
+        slew = self.__slew(position, i, t)
+        begin = t + slew
+        if observation.earliest is not None:
+            begin = max(begin, observation.earliest)
+        if observation.latest is not None and begin > observation.latest:
+            return None
+        if self.__altaz(i, begin)[0] < self.MIN_ALT_DEG:
+            return None
+        end = begin + observation.duration
+        follow = observation.bh == "follow"
+        return slew, begin, end, self.__altaz(i, end if follow else begin)
+
+    def __timeline(self, observations, order, start, position):
+        # ((missed, end), [(index, slew, planned)]), missed entries are skipped
+        t, missed, timeline = start, 0, []
+        for i in order:
+            step = self.__step(observations, i, t, position)
+            if step is None:
+                missed += 1
+                timeline.append((i, None, None))
+                continue
+            slew, begin, t, position = step
+            timeline.append((i, slew, begin))
+        return (missed, t), timeline
+
+    def __nearest_neighbour(self, observations, start, position) -> list:
+        t, remaining, order = start, set(range(len(observations))), []
+        while remaining:
+            best, best_key = None, None
+            for i in remaining:
+                step = self.__step(observations, i, t, position)
+                latest = observations[i].latest
+                deadline = float("inf") if latest is None else latest
+                key = (1, 0.0, deadline) if step is None else (0, step[1], deadline)
+                if best_key is None or key < best_key:
+                    best, best_key = i, key
+            step = self.__step(observations, best, t, position)
+            if step is not None:
+                _, _, t, position = step
+            remaining.discard(best)
+            order.append(best)
+        return order
+
+    def __slews(self, observations, timeline, start, position) -> tuple:
+        # slew seconds from the start position and between every pair, taken
+        # at the times of the given timeline so each 2-opt move is a lookup
+        t, here = start, position
+        origin = [
+            0.0 if position is None else self.__slew(position, i, start)
+            for i in range(len(observations))
+        ]
+        ends = [None] * len(observations)
+        for i, slew, planned in timeline:
+            if planned is None:
+                ends[i] = (t, here or self.__altaz(i, t))
+                continue
+            observation = observations[i]
+            t = planned + observation.duration
+            here = self.__altaz(i, t if observation.bh == "follow" else planned)
+            ends[i] = (t, here)
+        matrix = []
+        for t, (alt, az) in ends:
+            row = []
+            for j in range(len(observations)):
+                alt_j, az_j = self.__altaz(j, t)
+                row.append(self.__trajectory.duration(az, alt, az_j, alt_j))
+            matrix.append(row)
+        return origin, matrix
+
+    @staticmethod
+    def __prefix(order, matrix) -> tuple:
+        # running slew sums along the order, forwards and with every edge reversed
+        forward, backward = [0.0], [0.0]
+        for a, b in zip(order, order[1:]):
+            forward.append(forward[-1] + matrix[a][b])
+            backward.append(backward[-1] + matrix[b][a])
+        return forward, backward
+
+    def __two_opt(self, observations, order, start, position) -> list:
+        for _ in range(self.MAX_PASSES):
+            # slews re-taken once per pass, at the times of the current order
+            best, timeline = self.__timeline(observations, order, start, position)
+            origin, matrix = self.__slews(observations, timeline, start, position)
+            # the missed ones are skipped without moving, so they stay out of the
+            # reversals and ride at the end, where the timeline can still place them
+            missed = [i for i, _, planned in timeline if planned is None]
+            order = [i for i, _, planned in timeline if planned is not None]
+            forward, backward = self.__prefix(order, matrix)
+            n = len(order)
+            improved = False
+            for i in range(n - 1):
+                for j in range(i + 1, n):
+                    # slew change of reversing order[i..j], from its two end
+                    # edges and the prefix sums of the edges inside it
+                    a, b = order[i], order[j]
+                    before = forward[j] - forward[i]
+                    after = backward[j] - backward[i]
+                    if i == 0:
+                        before += origin[a]
+                        after += origin[b]
+                    else:
+                        before += matrix[order[i - 1]][a]
+                        after += matrix[order[i - 1]][b]
+                    if j < n - 1:
+                        before += matrix[b][order[j + 1]]
+                        after += matrix[a][order[j + 1]]
+                    if after >= before - self.MIN_GAIN_S:
+                        continue
+                    # windows and the moving targets are only in the timeline
+                    candidate = order[:i] + order[i : j + 1][::-1] + order[j + 1 :]
+                    cost, _ = self.__timeline(
+                        observations, candidate + missed, start, position
+                    )
+                    if cost < best:
+                        order, best, improved = candidate, cost, True
+                        forward, backward = self.__prefix(order, matrix)
+            order = order + missed
+            if not improved:
+                break
+        return order
+
+    def __execute(self, observations: list, optimize: bool) -> None:
+        mount = self.__mount
+        try:
+            self.__plan = self.plan(
+                observations,
+                mount.get_location(),
+                position=self.__position(mount),
+                optimize=optimize,
+                trajectory=getattr(mount, "trajectory", None),
+            )
+        except Exception as e:
+            for observation in observations:
+                observation.status = "failed"
+            Logging.error(f"Schedule planning failed: {e}", "Scheduler")
+            return
+
+        for observation in self.__plan:
+            if self.__cancel.is_set():
+                observation.status = "cancelled"
+                continue
+            if observation.status == "missed":
+                continue
+            if observation.earliest is not None and time() < observation.earliest:
+                observation.status = "waiting"
+                if self.__cancel.wait(observation.earliest - time()):
+                    observation.status = "cancelled"
+                    continue
+            if observation.latest is not None and time() > observation.latest:
+                observation.status = "missed"
+                continue
+            try:
+                self.__observe(mount, observation)
+            except RuntimeError:  # the executor refused, another run is active
+                observation.status = "skipped"
+                Logging.warning(
+                    f"Observation {observation.index} skipped, mount busy", "Scheduler"
+                )
+
+        self.__current = None
+        Logging.info(
+            f"Schedule finished, "
+            f"{sum(o.status == 'done' for o in self.__plan)}/{len(self.__plan)} done",
+            "Scheduler",
+        )
+
+    def __on_target(self, mount, handle, observation: Observation) -> float:
+        # the duration runs from the arrival on target, as planned, not from
+        # the submission: the slew comes first
+        slew = observation.slew or 0.0
+        arrival = observation.started + slew  # for mounts that cannot tell
+        deadline = arrival + slew + self.SETTLE_MARGIN_S
+        while not handle.done() and not self.__cancel.is_set():
+            on_target = mount.get_on_target()
+            if on_target is None:
+                self.__cancel.wait(max(0.0, arrival - time()))
+                return arrival
+            if on_target:
+                return time()
+            if time() > deadline:
+                Logging.warning(
+                    f"Observation {observation.index} not on target after "
+                    f"{time() - observation.started:.0f}s, starting anyway",
+                    "Scheduler",
+                )
+                return time()
+            self.__cancel.wait(0.1)
+        return time()
+
+    def __observe(self, mount, observation: Observation) -> None:
+        def prepare():
+            mount.set_target(
+                ra=observation.ra * units.deg, dec=observation.dec * units.deg
+            )
+            if observation.offset is not None:
+                mount.set_absolute_offset(
+                    ra=observation.offset[0] * units.deg,
+                    dec=observation.offset[1] * units.deg,
+                )
+
+        executor = mount.get_executor()
+        handle = executor.submit(observation.bh, prepare=prepare)
+        self.__handle = handle
+        self.__current = observation
+        observation.status = "running"
+        observation.started = time()
+        Logging.info(
+            f"Observation {observation.index} {observation.bh} "
+            f"ra {observation.ra:.4f} dec {observation.dec:.4f} "
+            f"for {observation.duration:.0f}s, run {handle.id}",
+            "Scheduler",
+        )
+        # follow never ends by itself, the others hold until the duration is up
+        begin = self.__on_target(mount, handle, observation)
+        if observation.bh == "follow":
+            if not handle.wait(max(0.0, begin + observation.duration - time())):
+                executor.cancel(handle.id)
+        handle.wait()
+        remaining = begin + observation.duration - time()
+        if remaining > 0 and handle.status == "done":
+            self.__cancel.wait(remaining)
+
+        observation.finished = time()
+        self.__current = None
+        self.__handle = None
+        if handle.status == "failed":
+            observation.status = "failed"
+        elif self.__cancel.is_set():
+            observation.status = "cancelled"
+        else:
+            observation.status = "done"
@@ -0,0 +1,118 @@
+import os
+import threading
+from time import perf_counter
+from classes.Logging import Logging
+from classes.DeviceInfo import DeviceInfo
+from drivers.HardwareProbe import HardwareProbe
+from SessionProperties import SessionProperties as SP
+
+
+class Startup:
+    _boot = perf_counter()
+    _lock = threading.Lock()
+    _iers_folder = "data/iers"  # optional local IERS-A/leap second overrides
+    _configured = False
+    _first_request = None
+    report = {}
+
+    @staticmethod
+    def configure_astropy():
+        """Pins IERS and leap second data to local files, never downloads"""
+        if Startup._configured:
+            return
+        start = perf_counter()
+
+        from astropy.utils import iers
+        from astropy.utils.data import conf as data_conf
+
+        data_conf.allow_internet = False
+        iers.conf.auto_download = False
+        iers.conf.auto_max_age = None
+        iers.conf.iers_degraded_accuracy = "warn"
+
+        iers_a = os.path.join(Startup._iers_folder, "finals2000A.all")
+        if not os.path.exists(iers_a):
+            iers_a = iers.IERS_A_FILE  # copy bundled with astropy
+        leap_seconds = os.path.join(Startup._iers_folder, "Leap_Second.dat")
+        if not os.path.exists(leap_seconds):
+            leap_seconds = iers.IERS_LEAP_SECOND_FILE
+        iers.conf.system_leap_second_file = leap_seconds
+        iers.earth_orientation_table.set(iers.IERS_A.open(iers_a))
+
+        Startup._configured = True
+        Startup.report["astropy_s"] = perf_counter() - start
+        Logging.info(
+            f"astropy configured offline in "
+            f"{Startup.report['astropy_s']:.3f}s ({iers_a})",
+            "Startup",
+        )
+
+    @staticmethod
+    def get_mount():
+        """Creates the mount, and imports astropy, the first time it is needed"""
+        if SP().MOUNT is None:
+            with Startup._lock:
+                if SP().MOUNT is None:
+                    start = perf_counter()
+                    Startup.configure_astropy()
+                    SP().MOUNT = DeviceInfo.select_mount()
+                    Startup.report["mount_s"] = perf_counter() - start
+                    Logging.info(
+                        f"{type(SP().MOUNT).__name__} ready in "
+                        f"{Startup.report['mount_s']:.3f}s",
+                        "Startup",
+                    )
+        return SP().MOUNT
+
+    @staticmethod
+    def warmup():
+        """Builds the mount and runs one transform so the first request is fast"""
+        start = perf_counter()
+        Startup.get_mount()
+
+        from astropy import units
+        from astropy.time import Time
+        from astropy.coordinates import AltAz
+        from astropy.coordinates import SkyCoord
+        from astropy.coordinates import EarthLocation
+
+        location = EarthLocation(lat=0 * units.deg, lon=0 * units.deg)
+        SkyCoord(ra=0 * units.deg, dec=0 * units.deg).transform_to(
+            AltAz(obstime=Time.now(), location=location)
+        )
+        Startup.report["warmup_s"] = perf_counter() - start
+        Logging.info(f"warmup done in {Startup.report['warmup_s']:.3f}s", "Startup")
+
+    @staticmethod
+    def ready(warmup: bool):
+        """Marks the server as ready, optionally warming up in the background"""
+        probe = HardwareProbe.probe()
+        Startup.report["probe_s"] = probe["probe_s"]
+        Logging.info(
+            f"{probe['model']} ({probe['board']}), i2c buses {probe['i2c_buses']}, "
+            f"gpio {'yes' if probe['gpio'] else 'no'}, "
+            f"probed in {probe['probe_s'] * 1000:.1f}ms",
+            "Startup",
+        )
+        Startup.report["startup_s"] = perf_counter() - Startup._boot
+        Logging.info(f"server ready in {Startup.report['startup_s']:.3f}s", "Startup")
+        if warmup:
+            threading.Thread(target=Startup.warmup, daemon=True).start()
+
+    @staticmethod
+    def request_started():
+        if Startup._first_request is None:
+            Startup._first_request = perf_counter()
+
+    @staticmethod
+    def request_finished():
+        if (
+            Startup._first_request is not None
+            and "first_request_s" not in Startup.report
+        ):
+            Startup.report["first_request_s"] = perf_counter() - Startup._first_request
+            Logging.info(
+                f"first mount request served in "
+                f"{Startup.report['first_request_s']:.3f}s",
+                "Startup",
+            )
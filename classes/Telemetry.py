@@ -0,0 +1,99 @@
+import queue
+import threading
+from time import sleep
+from time import monotonic
+from classes.Logging import Logging
+
+
+class Telemetry:
+    """One producer samples the state at a fixed rate and fans it out"""
+
+    def __init__(
+        self, producer, rate_hz: float = 5.0, backlog: int = 16, max_clients: int = 8
+    ):
+        self.RATE_HZ = rate_hz
+        self.BACKLOG = backlog  # messages kept per slow client
+        self.MAX_CLIENTS = max_clients  # each client holds a server worker thread
+
+        self.__producer = producer  # returns the state serialized as JSON
+        self.__subscribers = set()
+        self.__lock = threading.Lock()
+        self.__thread = None
+        self.__seq = 0
+        self.__last = None  # (seq, message)
+
+    def subscribe(self) -> queue.Queue | None:
+        """Returns the client's queue, None when MAX_CLIENTS are connected"""
+        q = queue.Queue(maxsize=self.BACKLOG)
+        with self.__lock:
+            if len(self.__subscribers) >= self.MAX_CLIENTS:
+                return None
+            self.__subscribers.add(q)
+            if self.__last is not None:
+                q.put_nowait(self.__last)
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__loop, daemon=True)
+                self.__thread.start()
+        return q
+
+    def unsubscribe(self, q: queue.Queue) -> None:
+        with self.__lock:
+            self.__subscribers.discard(q)
+
+    def __publish(self, item) -> None:
+        with self.__lock:
+            subscribers = list(self.__subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(item)
+            except queue.Full:  # slow client, drop its oldest message
+                try:
+                    q.get_nowait()
+                    q.put_nowait(item)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def __loop(self) -> None:
+        period = 1 / self.RATE_HZ
+        next_tick = monotonic()
+        while True:
+            with self.__lock:
+                if not self.__subscribers:
+                    self.__thread = None
+                    return
+            try:
+                message = self.__producer()
+            except Exception as e:
+                Logging.error(f"Error producing state: {e}", "Telemetry")
+                message = None
+            if message is not None:
+                self.__seq += 1
+                self.__last = (self.__seq, message)
+                self.__publish(self.__last)
+
+            next_tick += period
+            delay = next_tick - monotonic()
+            if delay > 0:
+                sleep(delay)
+            else:
+                next_tick = monotonic()
+
+    def stream(
+        self, q: queue.Queue, changes_only: bool = False, keepalive: float = 15.0
+    ):
+        """Yields Server-Sent Events from a subscribed queue until the client
+        goes away"""
+        last = None
+        try:
+            while True:
+                try:
+                    seq, message = q.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if changes_only and message == last:
+                    continue
+                last = message
+                yield f"id: {seq}\ndata: {message}\n\n"
+        finally:
+            self.unsubscribe(q)
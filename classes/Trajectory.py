@@ -0,0 +1,92 @@
+import math
+import numpy as np
+from astropy import units
+from astropy.coordinates import SkyCoord
+
+
+class Trajectory:
+    """Great-circle slews timed against per-axis speed and acceleration limits"""
+
+    def __init__(
+        self,
+        speed: tuple = (2.0, 2.0),
+        accel: tuple = (1.0, 1.0),
+        step: float = 0.2,
+    ):
+        self.SPEED_DEG_S = np.array(speed, dtype=float)  # (az, alt)
+        self.ACCEL_DEG_S2 = np.array(accel, dtype=float)  # (az, alt)
+        self.STEP_DEG = step  # largest distance between path samples
+        self.__limits = [(float(v), float(a)) for v, a in zip(speed, accel)]
+
+    def path(self, start: SkyCoord, end: SkyCoord) -> SkyCoord:
+        """Samples of the great circle from start to end, both included"""
+        p0 = start.icrs.cartesian.xyz.value
+        p1 = end.icrs.cartesian.xyz.value
+        cos_angle = np.clip(np.dot(p0, p1), -1.0, 1.0)
+        angle = np.arccos(cos_angle)
+        n = int(np.ceil(np.degrees(angle) / self.STEP_DEG)) + 1
+
+        # unit vector normal to p0 in the plane of the circle
+        q = p1 - cos_angle * p0
+        if np.linalg.norm(q) < 1e-12:  # same or antipodal points
+            axis = np.array([0.0, 0.0, 1.0]) if abs(p0[2]) < 0.9 else np.eye(3)[0]
+            q = np.cross(p0, axis)
+        q /= np.linalg.norm(q)
+
+        theta = np.linspace(0.0, angle, max(n, 2))[:, None]
+        xyz = np.cos(theta) * p0 + np.sin(theta) * q
+        ra = np.degrees(np.arctan2(xyz[:, 1], xyz[:, 0])) % 360.0
+        dec = np.degrees(np.arcsin(np.clip(xyz[:, 2], -1.0, 1.0)))
+        ra[-1], dec[-1] = end.icrs.ra.deg, end.icrs.dec.deg  # exact endpoint
+        return SkyCoord(ra=ra * units.deg, dec=dec * units.deg, frame="icrs")
+
+    def profile(self, az, alt) -> np.ndarray:
+        """Seconds from the start to each alt/az sample, at rest at both ends"""
+        az = np.unwrap(np.asarray(az, dtype=float), period=360.0)
+        alt = np.asarray(alt, dtype=float)
+        n = len(az)
+        if n < 2:
+            return np.zeros(n)
+
+        # every segment is one unit of path progress u; the limits of the axes
+        # become limits on du/dt and d²u/dt² for that segment
+        delta = np.abs(np.stack((np.diff(az), np.diff(alt))))
+        with np.errstate(divide="ignore"):
+            u_speed = np.min(self.SPEED_DEG_S[:, None] / delta, axis=0)
+            u_accel = np.min(self.ACCEL_DEG_S2[:, None] / delta, axis=0)
+
+        cap = np.minimum(np.append(u_speed, 0.0), np.insert(u_speed, 0, 0.0))
+        v = np.zeros(n)
+        for k in range(1, n):  # accelerate as hard as allowed
+            v[k] = min(cap[k], np.sqrt(v[k - 1] ** 2 + 2 * u_accel[k - 1]))
+        v[-1] = 0.0
+        for k in range(n - 2, 0, -1):  # and brake in time for the end
+            v[k] = min(v[k], np.sqrt(v[k + 1] ** 2 + 2 * u_accel[k]))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dt = 2.0 / (v[:-1] + v[1:])
+            # a segment that starts and ends at rest is a trapezoid of its own
+            rest = self.trapezoid(1.0, u_speed, u_accel)
+        dt = np.where(v[:-1] + v[1:] == 0.0, rest, dt)
+        dt = np.where(np.isinf(u_speed), 0.0, dt)
+        return np.concatenate(([0.0], np.cumsum(dt)))
+
+    @staticmethod
+    def trapezoid(distance, speed, accel):
+        """Seconds to cover distance from rest to rest"""
+        cruise = distance >= speed * speed / accel  # reaches top speed
+        return np.where(
+            cruise, distance / speed + speed / accel, 2 * np.sqrt(distance / accel)
+        )
+
+    def duration(self, az0: float, alt0: float, az1: float, alt1: float) -> float:
+        """Seconds for a direct slew, each axis on its own trapezoidal profile"""
+        # scalar math, the scheduler calls this in its inner loops
+        seconds = 0.0
+        distances = (abs((az1 - az0 + 180.0) % 360.0 - 180.0), abs(alt1 - alt0))
+        for distance, (v, a) in zip(distances, self.__limits):
+            if distance >= v * v / a:
+                seconds = max(seconds, distance / v + v / a)
+            else:
+                seconds = max(seconds, 2 * math.sqrt(distance / a))
+        return seconds
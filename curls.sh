@@ -1,4 +1,5 @@
 server="192.168.1.55"
+gateway="192.168.1.50"
 
 # get session_id
 sid="$(curl -X GET http://$server:56361/session/acquire | jq -r '.session_id')"
@@ -84,6 +85,63 @@ curl -X GET http://$server:56361/mount/status \
 curl -X GET http://$server:56361/mount/stop \
      -H "Authorization: $sid"
 
+# set mount target by catalog name
+curl -X POST http://$server:56361/mount/target \
+     -H "Content-Type: application/json" \
+     -H "Authorization: $sid" \
+     -d '{"name":"Cas A"}'
+
+# radio sources above 30 deg near the zenith
+curl -X GET "http://$server:56361/catalog/search?alt=90&az=0&radius=40&min_alt=30&kind=radio" \
+     -H "Authorization: $sid"
+
+# map 2x2 deg around the target
+curl -X GET "http://$server:56361/mount/run?bh=raster&size=2&spacing=0.25&speed=0.5" \
+     -H "Authorization: $sid"
+
+read -p "Pause 10 seconds or press ENTER" -t 10
+
+# stop the mount
+curl -X GET http://$server:56361/mount/stop \
+     -H "Authorization: $sid"
+
+# samples of the last map
+curl -X GET http://$server:56361/mount/scan \
+     -H "Authorization: $sid"
+
+# run a schedule of observations, ordered by slew time
+curl -X POST http://$server:56361/schedule \
+     -H "Content-Type: application/json" \
+     -H "Authorization: $sid" \
+     -d '{"observations": [{"ra": "23h23m24s", "dec": "58d48m54s", "bh": "follow", "duration": 600}, {"ra": "5h34m32s", "dec": "22d0m52s", "bh": "follow", "duration": 600}]}'
+
+# schedule status
+curl -X GET http://$server:56361/schedule \
+     -H "Authorization: $sid"
+
+# stop the schedule
+curl -X GET http://$server:56361/schedule/stop \
+     -H "Authorization: $sid"
+
+# move both servos together
+curl -X POST http://$server:56361/hwcontroller/batch \
+     -H "Content-Type: application/json" \
+     -H "Authorization: $sid" \
+     -d '{"moves":[{"ch":0,"angle":45},{"ch":1,"angle":120}]}'
+
+# get the gateway session_id
+gid="$(curl -X GET http://$gateway:56360/array/acquire | jq -r '.session_id')"
+
+# point every node of the array at the same source
+curl -X POST http://$gateway:56360/array/target \
+     -H "Content-Type: application/json" \
+     -H "Authorization: $gid" \
+     -d '{"name":"Cas A"}'
+
+# release the gateway session
+curl -X GET http://$gateway:56360/array/release \
+     -H "Authorization: $gid"
+
 # release session
 curl -X GET http://$server:56361/session/release \
-     -H "Authorization: $sid"
\ No newline at end of file
+     -H "Authorization: $sid"
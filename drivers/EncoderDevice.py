@@ -0,0 +1,133 @@
+import threading
+import numpy as np
+import drivers.is_rpi
+from time import monotonic
+from gpiozero import RotaryEncoder
+from classes.Device import Device
+
+
+class Singleton:
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(Singleton, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, "_initialized") and self._initialized:
+            return
+
+        self._initialized = True
+
+        self.PINA = 14
+        self.PINB = 15
+        self.MAX_STEPS = 360
+        self.HISTORY_SIZE = 64  # edges kept for the estimates
+        self.FIT_EDGES = 8  # edges used by the velocity/acceleration fit
+        self.IDLE_S = 0.5  # no edge for this long means the axis is still
+
+        # edge history, written only by the gpiozero callback thread
+        self.times = np.zeros(self.HISTORY_SIZE)
+        self.positions = np.zeros(self.HISTORY_SIZE)  # unwrapped steps
+        self.head = -1
+        self.steps = 0  # wrapped steps, as reported by gpiozero
+        self.unwrapped = 0
+
+        self.__lock = threading.Lock()
+        self.__target = None  # (steps, deadband, callback)
+
+        self.rotary_encoder = None
+        if drivers.is_rpi.is_rpi():
+            self.attach(
+                RotaryEncoder(
+                    a=self.PINA,
+                    b=self.PINB,
+                    wrap=True,
+                    max_steps=self.MAX_STEPS,
+                )
+            )
+
+    def attach(self, rotary_encoder):
+        self.steps = rotary_encoder.steps
+        self.rotary_encoder = rotary_encoder
+        self.rotary_encoder.when_rotated = self.edge
+
+    def edge(self, steps: int | None = None):
+        timestamp = monotonic()
+        steps = self.rotary_encoder.steps if steps is None else steps
+
+        # gpiozero wraps between -max_steps and max_steps
+        span = 2 * self.MAX_STEPS
+        delta = (steps - self.steps + self.MAX_STEPS) % span - self.MAX_STEPS
+        self.steps = steps
+        self.unwrapped += delta
+
+        head = self.head + 1
+        self.times[head % self.HISTORY_SIZE] = timestamp
+        self.positions[head % self.HISTORY_SIZE] = self.unwrapped
+        self.head = head
+
+        # targets are azimuths in [0, 360), the count reaches them from either side
+        target = self.__target
+        if (
+            target is not None
+            and abs((target[0] - steps + 180) % 360 - 180) <= target[1]
+        ):
+            with self.__lock:
+                if self.__target is not target:
+                    return
+                self.__target = None
+            target[2]()
+
+    def arm(self, steps: float, deadband: float, callback):
+        with self.__lock:
+            self.__target = (steps, deadband, callback)
+
+    def disarm(self):
+        with self.__lock:
+            self.__target = None
+
+
+class EncoderDevice(Device):
+    def __init__(self):
+        Singleton()
+
+    def read(self):
+        """Returns (position, velocity, acceleration) in steps, steps/s, steps/s²,
+        None without an encoder"""
+        hw = Singleton()
+        if hw.rotary_encoder is None:
+            return None
+        head = hw.head
+        count = min(hw.FIT_EDGES, head + 1)
+        if count < 2 or monotonic() - hw.times[head % hw.HISTORY_SIZE] > hw.IDLE_S:
+            return hw.steps, 0.0, 0.0
+
+        idx = np.arange(head - count + 1, head + 1) % hw.HISTORY_SIZE
+        t = hw.times[idx] - hw.times[idx[-1]]
+        p = hw.positions[idx]
+        if count < 3:
+            return hw.steps, float((p[1] - p[0]) / (t[1] - t[0] or 1e-9)), 0.0
+
+        # least squares p(t) = a t² + v t + p0 around the latest edge
+        a, v, _ = np.polyfit(t, p, 2)
+        return hw.steps, float(v), float(2 * a)
+
+    def history(self, count: int):
+        """Returns up to count (time, unwrapped steps) edges, oldest first"""
+        hw = Singleton()
+        count = max(0, min(count, hw.HISTORY_SIZE, hw.head + 1))
+        idx = np.arange(hw.head - count + 1, hw.head + 1) % hw.HISTORY_SIZE
+        return hw.times[idx].copy(), hw.positions[idx].copy()
+
+    def attach(self, rotary_encoder) -> None:
+        """Uses another RotaryEncoder-like object, e.g. the simulated one"""
+        Singleton().attach(rotary_encoder)
+
+    def arm(self, steps: float, deadband: float, callback) -> None:
+        """Calls callback once, from the edge thread, when steps is within deadband"""
+        Singleton().arm(steps, deadband, callback)
+
+    def disarm(self) -> None:
+        Singleton().disarm()
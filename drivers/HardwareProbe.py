@@ -0,0 +1,75 @@
+import os
+import re
+import glob
+import threading
+from time import perf_counter
+
+
+class HardwareProbe:
+    """Board, I2C buses and GPIO, read from the filesystem once per process"""
+
+    MODEL_FILES = ["/proc/device-tree/model", "/sys/firmware/devicetree/base/model"]
+    GPIO_DEVICES = ["/dev/gpiomem", "/dev/gpiochip0"]
+
+    _result = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def __read(path: str) -> str | None:
+        try:
+            with open(path, "r") as f:
+                return f.read().replace("\x00", "").strip()
+        except Exception:
+            return None
+
+    @staticmethod
+    def __serial() -> str:
+        try:
+            with open("/proc/cpuinfo", "r") as f:
+                for line in f:
+                    if line.startswith("Serial"):
+                        return line.split(":")[1].strip()
+        except Exception:
+            pass
+        return "unknownserial"
+
+    @staticmethod
+    def parse_model(model_raw: str):
+        match_zero = re.search(r"Pi\s*Zero\s*(2)?", model_raw)
+        match_model = re.search(r"Pi\s*([0-9]+)", model_raw)
+        if match_zero:  # "Pi Zero W" is Pi0, "Pi Zero 2 W" is Pi02
+            pi_number = f"0{match_zero.group(1) or ''}"
+        else:
+            pi_number = match_model.group(1) if match_model else "X"
+        match_rev = re.search(r"Rev\s*([0-9\.]+)", model_raw)
+        revision = match_rev.group(1) if match_rev else "X"
+
+        return f"Pi{pi_number}", revision
+
+    @staticmethod
+    def probe() -> dict:
+        """Detects the hardware the first time, returns the cached result after"""
+        if HardwareProbe._result is not None:
+            return HardwareProbe._result
+        with HardwareProbe._lock:
+            if HardwareProbe._result is None:
+                start = perf_counter()
+                model = next(
+                    filter(None, map(HardwareProbe.__read, HardwareProbe.MODEL_FILES)),
+                    "unknown",
+                )
+                board, revision = HardwareProbe.parse_model(model)
+                buses = sorted(
+                    int(path.rsplit("-", 1)[1]) for path in glob.glob("/dev/i2c-*")
+                )
+                HardwareProbe._result = {
+                    "model": model,
+                    "board": board,
+                    "revision": revision,
+                    "serial": HardwareProbe.__serial(),
+                    "is_rpi": "raspberry pi" in model.lower(),
+                    "i2c_buses": buses,
+                    "gpio": any(map(os.path.exists, HardwareProbe.GPIO_DEVICES)),
+                    "probe_s": perf_counter() - start,
+                }
+        return HardwareProbe._result
@@ -0,0 +1,161 @@
+import math
+import struct
+import smbus2
+import threading
+import drivers.is_rpi
+from time import time
+from time import sleep
+from classes.Device import Device
+from classes.Logging import Logging
+from classes.Metrics import I2C_ERRORS
+from classes.Metrics import I2C_TRANSFERS
+
+I2C_TRANSFER = I2C_TRANSFERS.bind(device="mpu6050")
+I2C_ERROR = I2C_ERRORS.bind(device="mpu6050")
+
+
+class Singleton:
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(Singleton, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, "_initialized") and self._initialized:
+            return
+
+        self._initialized = True
+
+        self.MPU6050_ADDR = 0x68
+        self.PWR_MGMT_1 = 0x6B
+        self.ACCEL_XOUT_H = 0x3B  # accel x/y/z, temperature, gyro x/y/z
+        self.BLOCK_SIZE = 14
+        self.ACCEL_LSB_G = 16384.0
+        self.GYRO_LSB_DPS = 131.0
+
+        self.RATE_HZ = 100  # samples per second
+        self.ALPHA = 0.2  # low-pass weight of the newest accel sample
+        self.BACKOFF_MIN_S = 0.05
+        self.BACKOFF_MAX_S = 2.0
+        self.RING_SIZE = 256
+
+        # single writer ring buffer: the slot is written before the head moves,
+        # head counts every sample ever written so readers never need a lock
+        self.ring = [None] * self.RING_SIZE
+        self.head = -1
+        self.errors = 0
+
+        self.bus_factory = lambda: smbus2.SMBus(1)
+        self.__running = False
+        self.__thread = None
+        if drivers.is_rpi.is_rpi():
+            self.start()
+
+    def attach(self, bus_factory):
+        self.bus_factory = bus_factory
+        self.start()
+
+    def start(self):
+        if self.__running:
+            return
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__sample_loop, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__running = False
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def __open(self):
+        bus = self.bus_factory()
+        bus.write_byte_data(self.MPU6050_ADDR, self.PWR_MGMT_1, 0)
+        return bus
+
+    def __sample_loop(self):
+        period = 1 / self.RATE_HZ
+        backoff = self.BACKOFF_MIN_S
+        bus = None
+        filtered = None
+        while self.__running:
+            try:
+                if bus is None:
+                    bus = self.__open()
+                block = bus.read_i2c_block_data(
+                    self.MPU6050_ADDR, self.ACCEL_XOUT_H, self.BLOCK_SIZE
+                )
+                timestamp = time()
+                ax, ay, az, _, gx, gy, gz = struct.unpack(">7h", bytes(block))
+                I2C_TRANSFER()
+            except Exception as e:
+                self.errors += 1
+                I2C_ERROR()
+                Logging.warning(
+                    f"Read failed, retrying in {backoff:.2f}s: {e}", "MPU6050"
+                )
+                try:
+                    bus.close()
+                except Exception:
+                    pass
+                bus = None
+                sleep(backoff)
+                backoff = min(backoff * 2, self.BACKOFF_MAX_S)
+                continue
+            backoff = self.BACKOFF_MIN_S
+
+            accel = (
+                ax / self.ACCEL_LSB_G,
+                ay / self.ACCEL_LSB_G,
+                az / self.ACCEL_LSB_G,
+            )
+            if filtered is None:
+                filtered = accel
+            else:
+                filtered = tuple(
+                    f + self.ALPHA * (a - f) for f, a in zip(filtered, accel)
+                )
+
+            norm = math.sqrt(sum(a * a for a in filtered))
+            if norm > 0:
+                theta_x = math.degrees(math.acos(filtered[0] / norm))
+                gyro = (
+                    gx / self.GYRO_LSB_DPS,
+                    gy / self.GYRO_LSB_DPS,
+                    gz / self.GYRO_LSB_DPS,
+                )
+                head = self.head + 1
+                self.ring[head % self.RING_SIZE] = (timestamp, theta_x, filtered, gyro)
+                self.head = head
+
+            sleep(max(0.0, period - (time() - timestamp)))
+
+        if bus is not None:
+            bus.close()
+
+
+class MPU6050Device(Device):
+    def __init__(self):
+        Singleton()  # starts the sampler on first use
+
+    def attach(self, bus_factory) -> None:
+        """Samples another SMBus-like object, e.g. the simulated one"""
+        Singleton().attach(bus_factory)
+
+    def read(self, max_age: float | None = None):
+        """Returns the latest (timestamp, altitude) sample, None if missing or stale"""
+        head = Singleton().head
+        if head < 0:
+            return None
+        timestamp, theta_x, _, _ = Singleton().ring[head % Singleton().RING_SIZE]
+        if max_age is not None and time() - timestamp > max_age:
+            return None
+        return timestamp, theta_x
+
+    def history(self, count: int) -> list:
+        """Returns up to count raw (timestamp, theta_x, accel, gyro) samples"""
+        ring, head = Singleton().ring, Singleton().head
+        count = max(0, min(count, len(ring), head + 1))
+        return [ring[(head - i) % len(ring)] for i in reversed(range(count))]
@@ -1,7 +1,21 @@
-import time
+import math
+import threading
 import socket
+import numpy as np
 import drivers.is_rpi
+from time import sleep
+from time import monotonic
+from astropy.time import Time
 from classes.Mount import Mount
+from classes.Logging import Logging
+from classes.Metrics import TRANSFORMS
+from classes.Metrics import MOUNT_TICKS
+from classes.Metrics import MOUNT_OVERRUNS
+from classes.Ephemeris import Ephemeris
+from classes.Trajectory import Trajectory
+from astropy.coordinates import AltAz
+from astropy.coordinates import SkyCoord
+from drivers.PCA9685Device import PCA9685Device
 
 if drivers.is_rpi.is_rpi():
     import RPi.GPIO as GPIO
@@ -9,6 +23,9 @@ if drivers.is_rpi.is_rpi():
     from board import SCL, SDA
     import busio
 
+TICKS = MOUNT_TICKS.bind(loop="servo")
+OVERRUNS = MOUNT_OVERRUNS.bind(loop="servo")
+
 
 class Singleton:
     _instance = None
@@ -24,18 +41,151 @@ class Singleton:
         self._initialized = True
         self.pca = None
 
+        self.UPDATE_RATE_HZ = 50  # servo setpoints per second, one PCA9685 frame
+        self.SPEED_DEG_S = 90.0  # per channel profile limits
+        self.ACCEL_DEG_S2 = 180.0
+        self.PULSE_MIN_US = 500
+        self.PULSE_MAX_US = 2500
+        self.LUT_STEP_DEG = 0.1  # angle resolution of the duty lookup table
+
+        self.output = PCA9685Device()
+        self.axes = {}  # channel -> [position, velocity, target, limit scale]
+        self.halted = True  # released by stop, nothing is written until a move
+        self.sequence = threading.Event()  # set to cancel the keyframes playing
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.set_frequency(100)
+        threading.Thread(target=self.__motion_loop, daemon=True).start()
+
         if drivers.is_rpi.is_rpi():
             try:
                 GPIO.setmode(GPIO.BCM)
                 GPIO.setwarnings(False)
                 i2c = busio.I2C(SCL, SDA)
                 self.pca = PCA9685(i2c)
-                self.pca.frequency = 100
-                print("[Singleton] PCA9685 initialized @100Hz")
+                self.pca.frequency = 100  # also turns on register auto-increment
+                PCA9685Device.attach(self.pca)
+                Logging.info("PCA9685 initialized @100Hz", "Monitor")
             except Exception as e:
-                print("[Singleton] Error initializing PCA9685:", e)
+                Logging.error(f"Error initializing PCA9685: {e}", "Monitor")
         else:
-            print("[Singleton] Mock mode (non-Raspberry environment).")
+            Logging.info("Mock mode (non-Raspberry environment).", "Monitor")
+
+    def set_frequency(self, freq):
+        """Rebuilds the angle -> duty table for a new PWM period"""
+        period_us = 1_000_000 / freq
+        n = int(round(180 / self.LUT_STEP_DEG)) + 1
+        span = self.PULSE_MAX_US - self.PULSE_MIN_US
+        lut = [
+            int((self.PULSE_MIN_US + span * k / (n - 1)) / period_us * 65535)
+            for k in range(n)
+        ]
+        with self.lock:
+            self.period_us, self.lut = period_us, lut
+
+    def duty(self, angle):
+        index = int(round(angle / self.LUT_STEP_DEG))
+        return self.lut[max(0, min(len(self.lut) - 1, index))]
+
+    @staticmethod
+    def trapezoid_step(position, velocity, target, speed, accel, dt):
+        """Advances one tick towards target, braking in time to stop on it"""
+        distance = target - position
+        # fastest speed from which accel still stops on the target
+        wanted = math.copysign(
+            min(speed, math.sqrt(2 * accel * abs(distance))), distance
+        )
+        velocity += max(-accel * dt, min(accel * dt, wanted - velocity))
+        if velocity * distance >= 0 and abs(velocity * dt) >= abs(distance):
+            return target, 0.0
+        return position + velocity * dt, velocity
+
+    def moving(self, channels=None):
+        return any(
+            axis[0] != axis[2] or axis[1] != 0.0
+            for channel, axis in self.axes.items()
+            if channels is None or channel in channels
+        )
+
+    def remaining(self, channels):
+        """Largest distance in deg still to go on the given channels"""
+        return max(
+            (abs(a[2] - a[0]) for c, a in self.axes.items() if c in channels),
+            default=0.0,
+        )
+
+    def aim(self, angles: dict, pulses: dict | None = None, sync: bool = False):
+        """New profile targets and raw pulses, written as one update; a
+        channel never moved before jumps. With sync the limits of each channel
+        are scaled so that moves started from rest arrive together."""
+        span = self.PULSE_MAX_US - self.PULSE_MIN_US
+        with self.lock:
+            jumps = {}
+            for channel, pulse in (pulses or {}).items():
+                angle = max(0.0, min(180.0, (pulse - self.PULSE_MIN_US) / span * 180))
+                self.axes[channel] = [angle, 0.0, angle, 1.0]
+                jumps[channel] = int(pulse / self.period_us * 65535)
+            longest = max(
+                (abs(a - self.axes[c][0]) for c, a in angles.items() if c in self.axes),
+                default=0.0,
+            )
+            for channel, angle in angles.items():
+                axis = self.axes.get(channel)
+                if axis is None:
+                    self.axes[channel] = [angle, 0.0, angle, 1.0]
+                    jumps[channel] = self.duty(angle)
+                    continue
+                axis[2] = angle
+                axis[3] = 1.0
+                if sync and longest > 0.0:
+                    axis[3] = max(abs(angle - axis[0]) / longest, 1e-3)
+            self.halted = False
+            if jumps:
+                self.output.write(jumps)
+            self.wake.set()
+
+    def release(self, channels):
+        """Holds every profile where it is and cuts the pulses"""
+        with self.lock:
+            for axis in self.axes.values():
+                axis[1], axis[2], axis[3] = 0.0, axis[0], 1.0
+            self.halted = True
+            self.output.write({ch: 0 for ch in channels})
+
+    def __motion_loop(self):
+        period = 1 / self.UPDATE_RATE_HZ
+        last = monotonic()
+        while True:
+            self.wake.clear()
+            if not self.moving():
+                self.wake.wait()
+                last = monotonic()
+                continue
+            delay = last + period - monotonic()
+            if delay > 0:
+                sleep(delay)
+            else:
+                OVERRUNS()
+            now = monotonic()
+            TICKS(now - last)
+            dt, last = min(now - last, 4 * period), now
+            with self.lock:
+                duties = {}
+                for channel, axis in self.axes.items():
+                    if axis[0] == axis[2] and axis[1] == 0.0:
+                        continue
+                    position, velocity, target, scale = axis
+                    axis[0], axis[1] = self.trapezoid_step(
+                        position,
+                        velocity,
+                        target,
+                        self.SPEED_DEG_S * scale,
+                        self.ACCEL_DEG_S2 * scale,
+                        dt,
+                    )
+                    duties[channel] = self.duty(axis[0])
+                if duties and not self.halted:
+                    self.output.write(duties)
 
 
 class Monitor(Mount):
@@ -45,28 +195,43 @@ class Monitor(Mount):
         self.FREQUENCY_HZ = 100
         self.PERIOD_US = 1_000_000 / self.FREQUENCY_HZ
         self.CHANNELS = [0, 1]
+        self.PAN_CHANNEL, self.TILT_CHANNEL = self.CHANNELS
+        self.PAN_CENTER_AZ = 180.0  # azimuth the pan servo faces at 90°
+        self.TILT_ZERO_ALT = 0.0  # altitude the tilt servo faces at 0°
+        self.TRACK_RATE_HZ = 20  # follow and route target updates per second
+        self.ROUTE_STEP_DEG = 1.0  # route waypoint spacing along the great circle
+
+        self.__location = None
+        self.__target = None  # it is always in icrs
+        self.__offset = None  # it is always in icrs
+        self.__behavior = None
         self.__running = False
+        self.__cancel = threading.Event()  # set to cancel the current run
 
         self.hw = Singleton()
         self.pca = self.hw.pca
+        self.output = self.hw.output  # coalesced, rate limited channel writes
+        self.trajectory = Trajectory(
+            speed=(self.hw.SPEED_DEG_S, self.hw.SPEED_DEG_S),
+            accel=(self.hw.ACCEL_DEG_S2, self.hw.ACCEL_DEG_S2),
+            step=self.ROUTE_STEP_DEG,
+        )
 
         if self.pca:
-            print("[MonitorMount] PCA9685 ready.")
+            Logging.info("PCA9685 ready.", "MonitorMount")
         else:
-            print("[MonitorMount] PCA9685 unavailable (mock mode).")
+            Logging.info("PCA9685 unavailable (mock mode).", "MonitorMount")
 
     def move_servo(self, channel, angle):
-        """Moves a servo with linear conversion 0–180°"""
+        """Moves a servo to 0–180° along a trapezoidal profile"""
         try:
             if self.pca is None:
                 return False, "PCA9685 not initialized"
+            if not 0 <= angle <= 180:
+                return False, "angle must be between 0 and 180"
 
-            pulse_min, pulse_max = 500, 2500  # microseconds
-            pulse_us = pulse_min + (pulse_max - pulse_min) * (angle / 180.0)
-            duty = int(pulse_us / self.PERIOD_US * 65535)
-            self.pca.channels[channel].duty_cycle = duty
-            print(f"[SERVO {channel}] → {angle:.2f}° ({pulse_us:.0f} µs)")
-            self.__running = True
+            self.hw.aim({channel: angle})
+            Logging.debug(f"[SERVO {channel}] → {angle:.2f}°", "MonitorMount")
             return True, None
         except Exception as e:
             return False, str(e)
@@ -76,24 +241,55 @@ class Monitor(Mount):
         try:
             if not self.pca:
                 return False, "PCA9685 not initialized"
-            duty = int(pulse / self.PERIOD_US * 65535)
-            self.pca.channels[channel].duty_cycle = duty
-            print(f"[SERVO {channel}] direct impulse {pulse} µs")
-            self.__running = True
+            self.hw.aim({}, {channel: pulse})
+            Logging.debug(
+                f"[SERVO {channel}] direct impulse {pulse} µs", "MonitorMount"
+            )
             return True, None
         except Exception as e:
             return False, str(e)
 
+    def move_batch(self, angles: dict, pulses: dict | None = None):
+        """Moves several servos in one update, angles arriving together"""
+        try:
+            if self.pca is None:
+                return False, "PCA9685 not initialized"
+            self.hw.sequence.set()  # a batch supersedes the keyframes playing
+            self.hw.aim(angles, pulses, sync=True)
+            Logging.debug(f"[BATCH] {angles} {pulses or {}}", "MonitorMount")
+            return True, None
+        except Exception as e:
+            return False, str(e)
+
+    def play(self, keyframes: list):
+        """Plays (seconds, angles, pulses) keyframes in the background,
+        replacing the sequence already playing"""
+        if self.pca is None:
+            return False, "PCA9685 not initialized"
+        self.hw.sequence.set()
+        self.hw.sequence = cancel = threading.Event()
+
+        def sequence():
+            start = monotonic()
+            for t, angles, pulses in keyframes:
+                if cancel.wait(max(0.0, start + t - monotonic())):
+                    return
+                self.hw.aim(angles, pulses, sync=True)
+            Logging.debug(f"{len(keyframes)} keyframes played", "MonitorMount")
+
+        threading.Thread(target=sequence, daemon=True).start()
+        return True, None
+
     def stop(self):
         """Stops all servos"""
         try:
-            if self.pca:
-                for ch in self.CHANNELS:
-                    self.pca.channels[ch].duty_cycle = 0
+            self.__cancel.set()
+            self.hw.sequence.set()
+            self.hw.release(self.CHANNELS)
             self.__running = False
-            print("[MonitorMount] Servos stopped.")
+            Logging.info("Servos stopped.", "MonitorMount")
         except Exception as e:
-            print("[MonitorMount] Error stopping servos:", e)
+            Logging.error(f"Error stopping servos: {e}", "MonitorMount")
 
     def set_frequency(self, freq):
         """Changes PWM frequency"""
@@ -102,7 +298,8 @@ class Monitor(Mount):
                 self.pca.frequency = freq
                 self.FREQUENCY_HZ = freq
                 self.PERIOD_US = 1_000_000 / freq
-                print(f"[MonitorMount] PWM frequency set to {freq} Hz")
+                self.hw.set_frequency(freq)
+                Logging.info(f"PWM frequency set to {freq} Hz", "MonitorMount")
             return True, None
         except Exception as e:
             return False, str(e)
@@ -113,15 +310,14 @@ class Monitor(Mount):
         if not self.pca:
             return None
         try:
-            positions = {ch: self.pca.channels[ch].duty_cycle for ch in self.CHANNELS}
-            return positions
+            return self.output.read(self.CHANNELS)
         except Exception as e:
-            print("[MonitorMount] Error reading servo positions:", e)
+            Logging.error(f"Error reading servo positions: {e}", "MonitorMount")
             return None
 
     def get_running(self):
         """Returns True if running"""
-        return self.__running
+        return self.__running or self.hw.moving(self.CHANNELS)
 
     def get_info(self):
         """Returns device and PCA9685 info"""
@@ -134,6 +330,12 @@ class Monitor(Mount):
                 "frequency": self.FREQUENCY_HZ,
                 "channels": self.CHANNELS,
                 "pca_initialized": self.pca is not None,
+                "output": self.output.get_stats(),
+                "motion": {
+                    "update_rate": self.hw.UPDATE_RATE_HZ,
+                    "speed": self.hw.SPEED_DEG_S,
+                    "accel": self.hw.ACCEL_DEG_S2,
+                },
             }
         except Exception as e:
             return {"error": str(e)}
@@ -165,9 +367,19 @@ class Monitor(Mount):
             <span id="val1">90°</span>
           </div>
           <script>
+            // one request in flight per channel, only the newest value is sent
+            const latest = {}, busy = {};
             async function send(ch,val){
               document.getElementById("val"+ch).innerText = val + "°";
-              await fetch(`/hardware/move?ch=${ch}&angle=${val}`);
+              latest[ch] = val;
+              if (busy[ch]) return;
+              busy[ch] = true;
+              while (latest[ch] !== undefined) {
+                const angle = latest[ch];
+                delete latest[ch];
+                await fetch(`/hwcontroller/move?ch=${ch}&angle=${angle}`, {method: "POST"});
+              }
+              busy[ch] = false;
             }
           </script>
         </body>
@@ -176,49 +388,141 @@ class Monitor(Mount):
 
     #  Implementations for Mount (abstract)
     def set_location(self, location):
-        """Imposta la posizione geografica simulata"""
-        self._location = location
-        print(f"[MonitorMount] Location set: {location}")
+        """Imposta la posizione geografica"""
+        self.__location = location
+        Logging.info(f"Location set: {location}", "MonitorMount")
 
     def get_location(self):
         """Ritorna la posizione impostata"""
-        return getattr(self, "_location", None)
+        return self.__location
+
+    def __altaz_frame(self):
+        return AltAz(obstime=Time.now(), location=self.__location)
 
+    @TRANSFORMS.time(op="set_target")
     def set_target(self, alt=None, az=None, ra=None, dec=None):
         """Imposta il target"""
-        self._target = {"alt": alt, "az": az, "ra": ra, "dec": dec}
-        print(f"[MonitorMount] Target set: {self._target}")
+        if alt is not None and az is not None:
+            altaz_coords = SkyCoord(alt=alt, az=az, frame=self.__altaz_frame())
+            self.__target = altaz_coords.transform_to("icrs")
+        elif ra is not None and dec is not None:
+            self.__target = SkyCoord(ra=ra, dec=dec, frame="icrs")
+        Logging.info(f"Target set: {self.__target}", "MonitorMount")
 
     def get_target(self):
         """Ritorna il target corrente"""
-        return getattr(self, "_target", None)
+        return self.__target
 
+    @TRANSFORMS.time(op="set_absolute_offset")
     def set_absolute_offset(self, alt=None, az=None, ra=None, dec=None):
         """Offset assoluto"""
-        self._abs_offset = {"alt": alt, "az": az, "ra": ra, "dec": dec}
-        print(f"[MonitorMount] Absolute offset set: {self._abs_offset}")
+        if alt is not None or az is not None:
+            altaz_frame = self.__altaz_frame()
+            altaz_coords = self.__target.transform_to(altaz_frame)
+            altaz_coords = SkyCoord(
+                alt=alt if alt is not None else altaz_coords.alt,
+                az=az if az is not None else altaz_coords.az,
+                frame=altaz_frame,
+            )
+            self.__offset = altaz_coords.transform_to("icrs")
+        elif ra is not None or dec is not None:
+            self.__offset = SkyCoord(
+                ra=ra if ra is not None else self.__target.ra,
+                dec=dec if dec is not None else self.__target.dec,
+                frame="icrs",
+            )
+        Logging.info(f"Absolute offset set: {self.__offset}", "MonitorMount")
 
+    @TRANSFORMS.time(op="set_relative_offset")
     def set_relative_offset(self, alt=None, az=None, ra=None, dec=None):
         """Offset relativo"""
-        self._rel_offset = {"alt": alt, "az": az, "ra": ra, "dec": dec}
-        print(f"[MonitorMount] Relative offset set: {self._rel_offset}")
+        if alt is not None or az is not None:
+            altaz_frame = self.__altaz_frame()
+            altaz_coords = self.__target.transform_to(altaz_frame)
+            altaz_coords = SkyCoord(
+                alt=altaz_coords.alt - alt if alt is not None else altaz_coords.alt,
+                az=altaz_coords.az - az if az is not None else altaz_coords.az,
+                frame=altaz_frame,
+            )
+            self.__offset = altaz_coords.transform_to("icrs")
+        elif ra is not None or dec is not None:
+            self.__offset = SkyCoord(
+                ra=self.__target.ra - ra if ra is not None else self.__target.ra,
+                dec=self.__target.dec - dec if dec is not None else self.__target.dec,
+                frame="icrs",
+            )
+        Logging.info(f"Relative offset set: {self.__offset}", "MonitorMount")
 
     def get_offset(self):
         """Ritorna offset attuale"""
-        return getattr(self, "_rel_offset", None) or getattr(self, "_abs_offset", None)
+        return self.__offset
 
     def get_behavior(self):
         """Comportamento corrente (follow, route...)"""
-        return getattr(self, "_behavior", None)
+        return self.__behavior
 
-    def run(self, bh: str):
-        """Simula un comportamento"""
-        self._behavior = bh
-        self.__running = True
-        print(f"[MonitorMount] Run started (behavior='{bh}')")
+    def point(self, alt, az):
+        """Aims pan/tilt at alt/az in deg, clipped to the servo range"""
+        pan = 90.0 + (az - self.PAN_CENTER_AZ + 180.0) % 360.0 - 180.0
+        tilt = alt - self.TILT_ZERO_ALT
+        clipped = not (0.0 <= pan <= 180.0 and 0.0 <= tilt <= 180.0)
+        if clipped:
+            Logging.debug(f"alt {alt:.2f} az {az:.2f} out of reach", "MonitorMount")
+        self.hw.aim(
+            {
+                self.PAN_CHANNEL: float(max(0.0, min(180.0, pan))),
+                self.TILT_CHANNEL: float(max(0.0, min(180.0, tilt))),
+            }
+        )
+        return not clipped
 
-        # Simulazione movimento 2 secondi
-        time.sleep(2)
+    def __wait_reached(self):
+        channels = [self.PAN_CHANNEL, self.TILT_CHANNEL]
+        while self.hw.moving(channels):
+            if self.__cancel.wait(1 / self.hw.UPDATE_RATE_HZ):
+                return
 
-        self.__running = False
-        print(f"[MonitorMount] Run finished (behavior='{bh}')")
+    def run(self, bh: str, cancel=None, **params):
+        """Drives the pan/tilt servos through a behavior until done or cancel"""
+        self.__cancel = threading.Event() if cancel is None else cancel
+        self.__behavior = bh
+        self.__running = True
+        Logging.info(f"Run started (behavior='{bh}')", "MonitorMount")
+        try:
+            self.__behave(bh)
+        finally:
+            self.__running = False
+        Logging.info(f"Run finished (behavior='{bh}')", "MonitorMount")
+
+    def __behave(self, bh: str):
+        if bh == "follow":
+            ephemeris = Ephemeris(self.__target, self.__location)
+            while not self.__cancel.is_set():
+                az, alt = ephemeris.at()
+                self.point(alt, az)
+                self.__cancel.wait(1 / self.TRACK_RATE_HZ)
+        elif bh == "transit":
+            altaz_coords = self.__target.transform_to(self.__altaz_frame())
+            if not self.point(altaz_coords.alt.deg, altaz_coords.az.deg):
+                Logging.warning("Target out of the servo range", "MonitorMount")
+            self.__wait_reached()
+        elif bh == "route":
+            path_coords = self.trajectory.path(self.__offset, self.__target)
+            altaz_coords = path_coords.transform_to(self.__altaz_frame())
+            alts = altaz_coords.alt.deg
+            azs = np.unwrap(altaz_coords.az.deg, period=360.0)
+            times = self.trajectory.profile(azs, alts)
+            self.point(alts[0], azs[0])
+            self.__wait_reached()
+            # stream the timed great circle, the profiles smooth between updates
+            start = monotonic()
+            while not self.__cancel.wait(1 / self.TRACK_RATE_HZ):
+                t = monotonic() - start
+                if t >= times[-1]:
+                    break
+                self.point(np.interp(t, times, alts), np.interp(t, times, azs) % 360.0)
+            if not self.__cancel.is_set():
+                self.point(alts[-1], azs[-1] % 360.0)
+                self.__wait_reached()
+        else:
+            Logging.warning(f"Behavior '{bh}' not supported", "MonitorMount")
@@ -0,0 +1,157 @@
+import threading
+from time import sleep
+from time import monotonic
+from classes.Device import Device
+from classes.Logging import Logging
+from classes.Metrics import I2C_ERRORS
+from classes.Metrics import I2C_TRANSFERS
+
+I2C_TRANSFER = I2C_TRANSFERS.bind(device="pca9685")
+I2C_ERROR = I2C_ERRORS.bind(device="pca9685")
+
+
+class Singleton:
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(Singleton, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, "_initialized") and self._initialized:
+            return
+
+        self._initialized = True
+
+        self.LED0_ON_L = 0x06  # first channel register, 4 per channel
+        self.CHANNELS = 16
+        self.FRAME_RATE_HZ = 50  # at most this many bursts per second
+        self.BACKOFF_MIN_S = 0.05
+        self.BACKOFF_MAX_S = 2.0
+
+        self.pca = None  # adafruit PCA9685, None writes nowhere
+        self.pending = {}  # channel -> duty, the newest setpoint wins
+        self.shadow = [None] * self.CHANNELS  # duty last written per channel
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stats = {
+            "requests": 0,
+            "dropped": 0,
+            "frames": 0,
+            "transactions": 0,
+            "errors": 0,
+        }
+        threading.Thread(target=self.__frame_loop, daemon=True).start()
+
+    def attach(self, pca):
+        self.pca = pca
+
+    @staticmethod
+    def encode(duty: int) -> bytes:
+        # same 16 -> 12 bit mapping as adafruit_pca9685.PWMChannel
+        if duty >= 0xFFFF:
+            return bytes((0x00, 0x10, 0x00, 0x00))  # full on
+        off = (duty + 1) >> 4 if duty else 0
+        return bytes((0x00, 0x00, off & 0xFF, off >> 8))
+
+    def bursts(self, changed: dict) -> list:
+        """Splits the changed channels into runs of consecutive registers,
+        unchanged channels inside a run are rewritten with their shadow value"""
+        runs, run, last = [], None, None
+        for channel in sorted(changed):
+            if run is not None and all(
+                self.shadow[c] is not None for c in range(last + 1, channel)
+            ):
+                run.extend(range(last + 1, channel + 1))
+            else:
+                run = [channel]
+                runs.append(run)
+            last = channel
+        return [(run[0], [changed.get(c, self.shadow[c]) for c in run]) for run in runs]
+
+    def __write(self, first: int, duties: list) -> None:
+        data = bytearray([self.LED0_ON_L + 4 * first])
+        for duty in duties:
+            data += self.encode(duty)
+        with self.pca.i2c_device as i2c:  # MODE1 auto-increment is on
+            i2c.write(data)
+
+    def __frame_loop(self):
+        period = 1 / self.FRAME_RATE_HZ
+        backoff = self.BACKOFF_MIN_S
+        while True:
+            self.wake.wait()
+            start = monotonic()
+            with self.lock:
+                pending, self.pending = self.pending, {}
+                self.wake.clear()
+            changed = {c: d for c, d in pending.items() if self.shadow[c] != d}
+            failed = False
+            if changed:
+                self.stats["frames"] += 1
+                for first, duties in self.bursts(changed):
+                    if not failed:
+                        try:
+                            if self.pca is not None:
+                                self.__write(first, duties)
+                                self.stats["transactions"] += 1
+                                I2C_TRANSFER()
+                            for i, duty in enumerate(duties):
+                                self.shadow[first + i] = duty
+                            continue
+                        except Exception as e:
+                            failed = True
+                            self.stats["errors"] += 1
+                            I2C_ERROR()
+                            Logging.warning(
+                                f"Write failed, retrying in {backoff:.2f}s: {e}",
+                                "PCA9685",
+                            )
+                    # this burst and the rest of the frame wait for the backoff,
+                    # unless superseded by then
+                    with self.lock:
+                        for i, duty in enumerate(duties):
+                            self.pending.setdefault(first + i, duty)
+                        self.wake.set()
+            # pace the bus: newer setpoints wait for the next frame, or for the
+            # backoff while the bus is failing
+            delay = period - (monotonic() - start)
+            if failed:
+                delay = max(delay, backoff)
+                backoff = min(backoff * 2, self.BACKOFF_MAX_S)
+            elif changed:
+                backoff = self.BACKOFF_MIN_S
+            if delay > 0:
+                sleep(delay)
+
+
+class PCA9685Device(Device):
+    def __init__(self):
+        pass
+
+    def write(self, channels: dict) -> None:
+        """Queues duty cycles by channel, written together on the next frame"""
+        hw = Singleton()
+        with hw.lock:
+            for channel, duty in channels.items():
+                if not 0 <= channel < hw.CHANNELS:
+                    raise ValueError(f"channel {channel} out of range")
+                if channel in hw.pending:
+                    hw.stats["dropped"] += 1  # stale, never reaches the bus
+                hw.pending[channel] = max(0, min(0xFFFF, int(duty)))
+            hw.stats["requests"] += 1
+            hw.wake.set()
+
+    def read(self, channels: list) -> dict:
+        """Latest duty cycle per channel, pending or written, without I2C"""
+        hw = Singleton()
+        with hw.lock:
+            return {c: hw.pending.get(c, hw.shadow[c]) for c in channels}
+
+    def get_stats(self) -> dict:
+        return dict(Singleton().stats)
+
+    @staticmethod
+    def attach(pca):
+        Singleton().attach(pca)
@@ -1,8 +1,8 @@
-import math
-import smbus2
+import threading
 import numpy as np
 import drivers.is_rpi
-from time import sleep
+from time import time
+from time import monotonic
 
 if drivers.is_rpi.is_rpi():
     import RPi.GPIO as GPIO
@@ -13,12 +13,27 @@ from astropy.time import Time
 from datetime import datetime
 from datetime import timezone
 from classes.Mount import Mount
-from gpiozero import RotaryEncoder
+from classes.Logging import Logging
+from classes.Metrics import TRANSFORMS
+from classes.Metrics import MOUNT_TICKS
+from classes.Metrics import MOUNT_OVERRUNS
+from classes.Trajectory import Trajectory
+from classes.Ephemeris import Ephemeris
+from classes.MountState import MountState
+from classes.ScanPattern import ScanPattern
 from astropy.coordinates import AltAz
 from astropy.coordinates import SkyCoord
 from astropy.coordinates import EarthLocation
+from classes.Controller import AxisController
+from drivers.Simulator import SimPWM
+from drivers.Simulator import Simulator
+from drivers.EncoderDevice import EncoderDevice
+from drivers.MPU6050Device import MPU6050Device
 from drivers.TonalBuzzerDevice import TonalBuzzerDevice as TBD
 
+TICKS = MOUNT_TICKS.bind(loop="control")
+OVERRUNS = MOUNT_OVERRUNS.bind(loop="control")
+
 
 class Singleton:
     _instance = None
@@ -34,166 +49,425 @@ class Singleton:
 
         self._initialized = True
 
+        # azimuth motor
+        self.ENA = 18
+        self.IN1 = 23
+        self.IN2 = 24
+
+        # altitude motor
+        self.ENB = 12
+        self.IN3 = 8
+        self.IN4 = 25
+
+        self.gpio = None  # RPi.GPIO, or the simulator stand-in
         if drivers.is_rpi.is_rpi():
-            self.MPU6050_ADDR = 0x68
-            self.PWR_MGMT_1 = 0x6B
-            self.ACCEL_XOUT_H = 0x3B
-            self.GYRO_XOUT_H = 0x43
-            self.mpu6050_bus = None
-
-            GPIO.setmode(GPIO.BCM)
-            GPIO.setwarnings(False)
-
-            # azimuth motor
-            self.ENA = 18
-            self.IN1 = 23
-            self.IN2 = 24
-            self.pwm_a = PWMLED(self.ENA)
-            GPIO.setup(self.IN1, GPIO.OUT)
-            GPIO.setup(self.IN2, GPIO.OUT)
-
-            # altitude motor
-            self.ENB = 12
-            self.IN3 = 8
-            self.IN4 = 25
-            self.pwm_b = PWMLED(self.ENB)
-            GPIO.setup(self.IN3, GPIO.OUT)
-            GPIO.setup(self.IN4, GPIO.OUT)
-
-            # encoder
-            self.PINA = 14
-            self.PINB = 15
-            self.rotary_encoder = RotaryEncoder(
-                a=self.PINA,
-                b=self.PINB,
-                wrap=True,
-                max_steps=360,
-            )
+            self.__setup(GPIO, PWMLED(self.ENA), PWMLED(self.ENB))
+
+    def __setup(self, gpio, pwm_a, pwm_b) -> None:
+        gpio.setmode(gpio.BCM)
+        gpio.setwarnings(False)
+        self.pwm_a = pwm_a
+        gpio.setup(self.IN1, gpio.OUT)
+        gpio.setup(self.IN2, gpio.OUT)
+        self.pwm_b = pwm_b
+        gpio.setup(self.IN3, gpio.OUT)
+        gpio.setup(self.IN4, gpio.OUT)
+        self.gpio = gpio
+
+    def simulate(self, sim) -> None:
+        """Drives the simulated motors with the same direction/PWM calls"""
+        sim.gpio.wire(self.IN1, sim.azimuth, "in1")
+        sim.gpio.wire(self.IN2, sim.azimuth, "in2")
+        sim.gpio.wire(self.IN3, sim.altitude, "in1")
+        sim.gpio.wire(self.IN4, sim.altitude, "in2")
+        self.__setup(sim.gpio, SimPWM(sim.azimuth), SimPWM(sim.altitude))
+
+    def drive_azimuth(self, speed: float) -> None:
+        """Signed duty: > 0 forward, < 0 backward, 0 stops the motor"""
+        gpio = self.gpio
+        if gpio is not None:
+            gpio.output(self.IN1, gpio.HIGH if speed > 0 else gpio.LOW)
+            gpio.output(self.IN2, gpio.HIGH if speed < 0 else gpio.LOW)
+            self.pwm_a.value = min(abs(speed), 1.0)
+
+    def drive_altitude(self, speed: float) -> None:
+        """Signed duty: > 0 forward, < 0 backward, 0 stops the motor"""
+        gpio = self.gpio
+        if gpio is not None:
+            gpio.output(self.IN3, gpio.HIGH if speed > 0 else gpio.LOW)
+            gpio.output(self.IN4, gpio.HIGH if speed < 0 else gpio.LOW)
+            self.pwm_b.value = min(abs(speed), 1.0)
 
 
 class Radiotelescope(Mount):
-    def __init__(self):
+    def __init__(self, simulated: bool = False):
         self.__location = None
         self.__target = None  # it is always in icrs
         self.__offset = None  # it is always in icrs
         self.__behavior = None
         self.__running = False
+        self.__stop = threading.Event()  # set to cancel the current run
+        self.__stop_time = None
+
+        self.FOLLOW_RATE_HZ = 20  # follow mode control ticks per second
+        self.EPHEMERIS_SPAN_S = 600  # follow mode alt/az table length
+        self.EPHEMERIS_STEP_S = 1  # follow mode alt/az table spacing
+        self.__ephemeris = None
+
+        self.IMU_MAX_AGE_S = 0.5  # older altitude samples are not trusted
+        self.FEEDBACK_GRACE_S = 1.0  # run fails after this long without feedback
+        self.SETTLE_TIMEOUT_FACTOR = 2.0  # times the planned slew, to settle
+        self.SETTLE_MARGIN_S = 10.0  # added to the settle timeout
+        self.__fault = None  # why the control loop aborted the run
+        self.__imu = MPU6050Device()
+        self.__encoder = EncoderDevice()
+        if simulated:
+            sim = Simulator()
+            Singleton().simulate(sim)
+            self.__encoder.attach(sim.encoder)
+            self.__imu.attach(lambda: sim.imu)
+        self.CONTROL_RATE_HZ = 50  # closed loop motor control ticks per second
+        self.az_controller = AxisController(
+            kp=0.1, ki=0.02, kd=0.005, kv=0.1, max_accel=2.0, deadband=0.5, wrap=360.0
+        )
+        self.alt_controller = AxisController(
+            kp=0.1, ki=0.02, kd=0.005, kv=0.1, max_accel=2.0, deadband=0.5
+        )
+        self.__setpoint = None  # (az, alt, az_rate, alt_rate) set by the behaviors
+        self.__tracking_error = None  # (az, alt) in degrees
+        self.__tracked = None  # setpoint the tracking error refers to
+        self.__control_stats = None
+
+        self.POSITION_DIGITS = 2  # snapshot position resolution, 0.01 deg
+        self.STATE_MAX_AGE_S = 0.2  # idle snapshot position refresh
+        self.__state = MountState()
+        self.__state_lock = threading.Lock()  # between writers only
+        self.__position_time = 0.0
+
+        self.SLEW_SPEED_DEG_S = (2.0, 2.0)  # (az, alt) used to time slews
+        self.SLEW_ACCEL_DEG_S2 = (1.0, 1.0)  # (az, alt)
+        self.ROUTE_STEP_DEG = 0.2  # route waypoint spacing along the great circle
+        self.ROUTE_PASS_DEG = 1.0  # intermediate waypoint tolerance
+        self.trajectory = Trajectory(
+            speed=self.SLEW_SPEED_DEG_S,
+            accel=self.SLEW_ACCEL_DEG_S2,
+            step=self.ROUTE_STEP_DEG,
+        )
+        self.__route_report = None
+
+        self.SCAN_SPEED_DEG_S = 0.5  # default on-sky raster/spiral sweep speed
+        self.SCAN_LEAD_S = 0.5  # between settling on the first sample and the sweep
+        self.__scan_report = None
 
     def __now_utc(self):
         return Time(datetime.now(timezone.utc))
 
-    def __linear_path(self, start: SkyCoord, end: SkyCoord) -> SkyCoord:
-        ra_vals = np.arange(start.ra.deg, end.ra.deg, 0.2)
-        dec_vals = np.arange(start.dec.deg, end.dec.deg, 0.2)
-        ints = int((len(ra_vals) ** 2 + len(dec_vals) ** 2) ** 0.5 + 1)
-        ra_vals = np.linspace(start.ra.deg, end.ra.deg, ints) * units.deg
-        dec_vals = np.linspace(start.dec.deg, end.dec.deg, ints) * units.deg
-        return SkyCoord(ra=ra_vals, dec=dec_vals, frame=start.frame)
-
-    def __mpu6050_data(self) -> tuple[float, float, float] | None:
-        def start_restart():
-            bus = smbus2.SMBus(1)
-            bus.write_byte_data(Singleton().MPU6050_ADDR, Singleton().PWR_MGMT_1, 0)
-            return bus
-
-        def raw_data(bus, addr):
-            high = bus.read_byte_data(Singleton().MPU6050_ADDR, addr)
-            low = bus.read_byte_data(Singleton().MPU6050_ADDR, addr + 1)
-            value = (high << 8) | low
-            if value > 32767:
-                value -= 65536
-            return value
-
-        if not Singleton().mpu6050_bus:
-            Singleton().mpu6050_bus = start_restart()
-        try:
-            accel_x = raw_data(Singleton().mpu6050_bus, Singleton().ACCEL_XOUT_H)
-            accel_y = raw_data(Singleton().mpu6050_bus, Singleton().ACCEL_XOUT_H + 2)
-            accel_z = raw_data(Singleton().mpu6050_bus, Singleton().ACCEL_XOUT_H + 4)
-            accel_x /= 16384.0 / 9.81
-            accel_y /= 16384.0 / 9.81
-            accel_z /= 16384.0 / 9.81
-
-            a = math.sqrt(accel_x**2 + accel_y**2 + accel_z**2)
-            if a == 0:
-                return None
-
-            thetaX = math.degrees(math.acos(accel_x / a))
-            thetaY = math.degrees(math.acos(accel_y / a))
-            thetaZ = math.degrees(math.acos(accel_z / a))
-            return thetaX, thetaY, thetaZ
-        except:
-            Singleton().mpu6050_bus = None
-            self.__mpu6050_data()
-
     def __get_az(self) -> float:
-        return Singleton().rotary_encoder.steps if drivers.is_rpi.is_rpi() else None
+        state = self.__encoder.read()
+        return None if state is None else state[0]
+
+    def __az_reached(self) -> None:
+        # runs on the encoder edge thread, before the next control tick
+        Singleton().drive_azimuth(0)
+        self.az_controller.hold()
 
     def __get_alt(self) -> float:
-        return self.__mpu6050_data()[0] if drivers.is_rpi.is_rpi() else None
-
-    def __run(self, az: float, alt: float) -> None:
-        def forward_azimuth(speed):
-            if drivers.is_rpi.is_rpi():
-                GPIO.output(Singleton().IN1, GPIO.HIGH)
-                GPIO.output(Singleton().IN2, GPIO.LOW)
-                Singleton().pwm_a.value = speed
-
-        def backward_azimuth(speed):
-            if drivers.is_rpi.is_rpi():
-                GPIO.output(Singleton().IN1, GPIO.LOW)
-                GPIO.output(Singleton().IN2, GPIO.HIGH)
-                Singleton().pwm_a.value = speed
-
-        def forward_altitude(speed):
-            if drivers.is_rpi.is_rpi():
-                GPIO.output(Singleton().IN3, GPIO.HIGH)
-                GPIO.output(Singleton().IN4, GPIO.LOW)
-                Singleton().pwm_b.value = speed
-
-        def backward_altitude(speed):
-            if drivers.is_rpi.is_rpi():
-                GPIO.output(Singleton().IN3, GPIO.LOW)
-                GPIO.output(Singleton().IN4, GPIO.HIGH)
-                Singleton().pwm_b.value = speed
-
-        def stop_azimuth():
-            if drivers.is_rpi.is_rpi():
-                GPIO.output(Singleton().IN1, GPIO.LOW)
-                GPIO.output(Singleton().IN2, GPIO.LOW)
-                Singleton().pwm_a.value = 0
-
-        def stop_altitude():
-            if drivers.is_rpi.is_rpi():
-                GPIO.output(Singleton().IN3, GPIO.LOW)
-                GPIO.output(Singleton().IN4, GPIO.LOW)
-                Singleton().pwm_b.value = 0
-
-        az_real = self.__get_az()
-        alt_real = self.__get_alt()
-        print(f"Target {az:05f}, {alt:05f}", end="\t")
-        print(f"Position {az_real:05f}. {alt_real:05f}", end="\t")
-        ang_res = 5
-
-        if az > az_real + ang_res:
-            forward_azimuth(1)
-            print("→", end=" ")
-        elif az < az_real - ang_res:
-            backward_azimuth(1)
-            print("←", end=" ")
+        sample = self.__imu.read(max_age=self.IMU_MAX_AGE_S)
+        return None if sample is None else sample[1]
+
+    def __control_loop(self, stop: threading.Event) -> None:
+        period = 1 / self.CONTROL_RATE_HZ
+        self.az_controller.reset()
+        self.alt_controller.reset()
+        stats = self.__control_stats
+        ticks = 0
+        lost = None  # when the feedback went missing
+        last = next_tick = monotonic()
+        while self.__running and not stop.is_set():
+            next_tick += period
+            delay = next_tick - monotonic()
+            if delay > 0:
+                if stop.wait(delay):
+                    break
+            else:
+                next_tick = monotonic()  # overrun, do not try to catch up
+                stats["overruns"] += 1
+                OVERRUNS()
+            now = monotonic()
+            dt, last = now - last, now
+            TICKS(dt)
+            jitter = dt - period
+            stats["ticks"] += 1
+            stats["jitter_sq"] += jitter * jitter
+            stats["jitter_max"] = max(stats["jitter_max"], abs(jitter))
+
+            setpoint = self.__setpoint
+            if setpoint is None:
+                continue
+            encoder = self.__encoder.read()
+            alt_real = self.__get_alt()
+            if encoder is None or alt_real is None:
+                # blind, so nothing may keep its last duty
+                Singleton().drive_azimuth(0)
+                Singleton().drive_altitude(0)
+                self.az_controller.hold()
+                self.alt_controller.hold()
+                missing = "encoder" if encoder is None else "IMU"
+                if lost is None:
+                    lost = now
+                    Logging.warning(
+                        f"No {missing} feedback, motors stopped", "Radiotelescope"
+                    )
+                elif now - lost > self.FEEDBACK_GRACE_S:
+                    self.__fault = f"no {missing} feedback for {now - lost:.1f}s"
+                    Logging.error(f"Run aborted, {self.__fault}", "Radiotelescope")
+                    stop.set()
+                    break
+                continue
+            lost = None
+            az_real, az_velocity, _ = encoder
+            if stop.is_set():
+                break
+
+            az, alt, az_rate, alt_rate = setpoint
+            Singleton().drive_azimuth(
+                self.az_controller.update(az, az_rate, az_real, dt, az_velocity)
+            )
+            if abs(self.az_controller.error) > self.az_controller.deadband:
+                self.__encoder.arm(az, self.az_controller.deadband, self.__az_reached)
+            Singleton().drive_altitude(
+                self.alt_controller.update(alt, alt_rate, alt_real, dt)
+            )
+            self.__tracking_error = (
+                self.az_controller.error,
+                self.alt_controller.error,
+            )
+            self.__tracked = setpoint
+            self.__publish_position(alt_real, az_real, self.__tracking_error)
+            stats["error_n"] += 1
+            stats["error_sq"] += (
+                self.az_controller.error**2 + self.alt_controller.error**2
+            )
+
+            ticks += 1
+            if ticks % self.CONTROL_RATE_HZ == 0:
+                Logging.debug(
+                    f"Target {az:05f}, {alt:05f}\t"
+                    f"Position {az_real:05f}. {alt_real:05f}\t"
+                    f"Error {self.__tracking_error[0]:+.3f}, "
+                    f"{self.__tracking_error[1]:+.3f}",
+                    "Radiotelescope",
+                )
+
+        self.__encoder.disarm()
+        Singleton().drive_azimuth(0)
+        Singleton().drive_altitude(0)
+        if self.__stop_time is not None:
+            stats["stop_latency_ms"] = (monotonic() - self.__stop_time) * 1000
+
+    def __settled(self, tolerance: float | None = None) -> bool:
+        error = self.__tracking_error
+        if error is None or self.__tracked is not self.__setpoint:
+            return False
+        az_tol = self.az_controller.deadband if tolerance is None else tolerance
+        alt_tol = self.alt_controller.deadband if tolerance is None else tolerance
+        return abs(error[0]) <= az_tol and abs(error[1]) <= alt_tol
+
+    def __settle_timeout(self) -> float:
+        # what a healthy mount needs to reach the setpoint from where it is
+        setpoint, az, alt = self.__setpoint, self.__get_az(), self.__get_alt()
+        slew = 0.0
+        if setpoint is not None and az is not None and alt is not None:
+            slew = self.trajectory.duration(az, alt, setpoint[0], setpoint[1])
+        return slew * self.SETTLE_TIMEOUT_FACTOR + self.SETTLE_MARGIN_S
+
+    def __wait_settled(self, tolerance: float | None = None) -> None:
+        start = monotonic()
+        timeout = self.__settle_timeout()
+        while not self.__settled(tolerance):
+            if self.__stop.wait(1 / self.CONTROL_RATE_HZ):
+                return
+            if monotonic() - start > timeout:
+                raise RuntimeError(f"setpoint not reached in {timeout:.1f}s")
+        if tolerance is None:
+            self.__control_stats["settle_s"] = monotonic() - start
+
+    def __route(self, path_coords: SkyCoord) -> None:
+        # time the waypoints against the axis limits, from their alt/az now
+        altaz_frame = AltAz(obstime=self.__now_utc(), location=self.__location)
+        altaz_coords = path_coords.transform_to(altaz_frame)
+        offsets = self.trajectory.profile(altaz_coords.az.deg, altaz_coords.alt.deg)
+        start = time()
+        planned = start + offsets
+
+        # one batched transform for the whole path, plus one a second later
+        # to get the sky rates used as feedforward and for late arrivals
+        altaz_frame = AltAz(
+            obstime=Time(np.concatenate((planned, planned + 1)), format="unix"),
+            location=self.__location,
+        )
+        altaz_coords = SkyCoord(
+            ra=np.tile(path_coords.ra.deg, 2) * units.deg,
+            dec=np.tile(path_coords.dec.deg, 2) * units.deg,
+            frame="icrs",
+        ).transform_to(altaz_frame)
+        az, az_next = np.split(altaz_coords.az.deg, 2)
+        alt, alt_next = np.split(altaz_coords.alt.deg, 2)
+        az_rate = (az_next - az + 180.0) % 360.0 - 180.0
+        alt_rate = alt_next - alt
+
+        self.__route_report = []
+        last = len(az) - 1
+        for i in range(len(az)):
+            if self.__stop.is_set():
+                break
+            begin = time()
+            late = begin - planned[i]
+            self.__setpoint = (
+                float((az[i] + az_rate[i] * late) % 360.0),
+                float(alt[i] + alt_rate[i] * late),
+                float(az_rate[i]),
+                float(alt_rate[i]),
+            )
+            self.__wait_settled(None if i == last else self.ROUTE_PASS_DEG)
+            end = time()
+            self.__route_report.append(
+                {
+                    "index": i,
+                    "planned": float(planned[i] - start),
+                    "reached": end - start,
+                    "duration": end - begin,
+                }
+            )
+
+        durations = [w["duration"] for w in self.__route_report]
+        if durations:
+            Logging.info(
+                f"Route {len(durations)}/{len(az)} waypoints "
+                f"in {time() - start:.2f}s (planned {offsets[-1]:.2f}s), "
+                f"per waypoint mean "
+                f"{np.mean(durations):.3f}s max {np.max(durations):.3f}s",
+                "Radiotelescope",
+            )
+
+    def __scan(
+        self,
+        pattern: str,
+        size: float,
+        spacing: float,
+        speed: float | None = None,
+        height: float | None = None,
+    ) -> None:
+        speed = self.SCAN_SPEED_DEG_S if speed is None else speed
+        if pattern == "spiral":
+            dx, dy = ScanPattern.spiral(size / 2, spacing)
         else:
-            stop_azimuth()
-            print("↔", end=" ")
-
-        if alt > alt_real + ang_res:
-            forward_altitude(1)
-            print("↑")
-        elif alt < alt_real - ang_res:
-            backward_altitude(1)
-            print("↓")
+            dx, dy = ScanPattern.raster(
+                size, size if height is None else height, spacing
+            )
+        path_coords = SkyCoord(
+            lon=dx * units.deg,
+            lat=dy * units.deg,
+            frame=self.__target.skyoffset_frame(),
+        ).transform_to("icrs")
+
+        # settle on the first sample before the sweep clock starts
+        altaz_frame = AltAz(obstime=self.__now_utc(), location=self.__location)
+        first = path_coords[0].transform_to(altaz_frame)
+        self.__setpoint = (first.az.deg, first.alt.deg, 0.0, 0.0)
+        self.__wait_settled()
+        if self.__stop.is_set():
+            return
+
+        # one batched transform at the time each sample will be reached
+        start = time() + self.SCAN_LEAD_S
+        planned = start + ScanPattern.distance(dx, dy) / speed
+        altaz_frame = AltAz(
+            obstime=Time(planned, format="unix"), location=self.__location
+        )
+        altaz_coords = path_coords.transform_to(altaz_frame)
+        az = np.unwrap(altaz_coords.az.deg, period=360.0)
+        alt = altaz_coords.alt.deg
+        az_rate = np.gradient(az, planned) if len(planned) > 1 else np.zeros(1)
+        alt_rate = np.gradient(alt, planned) if len(planned) > 1 else np.zeros(1)
+        ra, dec = path_coords.ra.deg, path_coords.dec.deg
+
+        self.__scan_report = []
+        recorded = 0
+        while recorded < len(planned):
+            t = time()
+            self.__setpoint = (
+                float(np.interp(t, planned, az) % 360.0),
+                float(np.interp(t, planned, alt)),
+                float(np.interp(t, planned, az_rate)),
+                float(np.interp(t, planned, alt_rate)),
+            )
+            while recorded < len(planned) and planned[recorded] <= t:
+                az_real, alt_real = self.__get_az(), self.__get_alt()
+                self.__scan_report.append(
+                    {
+                        "index": recorded,
+                        "planned": round(float(planned[recorded] - start), 3),
+                        "t": round(t - start, 3),
+                        "ra": MountState.round(ra[recorded]),
+                        "dec": MountState.round(dec[recorded]),
+                        "az": MountState.round(az[recorded] % 360.0),
+                        "alt": MountState.round(alt[recorded]),
+                        "az_real": MountState.round(az_real),
+                        "alt_real": MountState.round(alt_real),
+                    }
+                )
+                recorded += 1
+            if self.__stop.wait(1 / self.FOLLOW_RATE_HZ):
+                break
+
+        errors = [
+            np.hypot(
+                (s["az_real"] - s["az"] + 180.0) % 360.0 - 180.0,
+                s["alt_real"] - s["alt"],
+            )
+            for s in self.__scan_report
+            if s["az_real"] is not None and s["alt_real"] is not None
+        ]
+        Logging.info(
+            f"Scan {pattern} {recorded}/{len(planned)} samples "
+            f"in {time() - start:.2f}s, pointing error rms "
+            f"{np.sqrt(np.mean(np.square(errors))) if errors else float('nan'):.3f}",
+            "Radiotelescope",
+        )
+
+    def __publish(self, **changes) -> None:
+        with self.__state_lock:
+            self.__state = self.__state.evolve(**changes)
+
+    def __publish_position(self, alt, az, error=None) -> None:
+        self.__position_time = monotonic()
+        position = None
+        if alt is not None and az is not None:
+            position = (
+                round(float(alt), self.POSITION_DIGITS),
+                round(float(az), self.POSITION_DIGITS),
+            )
+        if error is None:
+            self.__publish(position=position)
         else:
-            stop_altitude()
-            print("↕")
+            self.__publish(
+                position=position,
+                tracking_error=(MountState.round(error[0]), MountState.round(error[1])),
+            )
+
+    def __publish_coords(self) -> None:
+        def radec(coord):
+            if coord is None:
+                return None
+            return (MountState.round(coord.ra.deg), MountState.round(coord.dec.deg))
+
+        self.__publish(target=radec(self.__target), offset=radec(self.__offset))
+
+    def get_state(self) -> MountState:
+        if monotonic() - self.__position_time > self.STATE_MAX_AGE_S:
+            self.__publish_position(self.__get_alt(), self.__get_az())
+        return self.__state
 
     def get_location(self):
         return self.__location
@@ -213,9 +487,49 @@ class Radiotelescope(Mount):
     def get_running(self):
         return self.__running
 
+    def get_on_target(self) -> bool:
+        return self.__running and self.__settled()
+
+    def get_tracking_error(self):
+        return self.__tracking_error
+
+    def get_control_stats(self):
+        stats = self.__control_stats
+        if stats is None:
+            return None
+        ticks, error_n = stats["ticks"], stats["error_n"]
+        return {
+            "ticks": ticks,
+            "overruns": stats["overruns"],
+            "jitter_rms_ms": (
+                (stats["jitter_sq"] / ticks) ** 0.5 * 1000 if ticks else 0.0
+            ),
+            "jitter_max_ms": stats["jitter_max"] * 1000,
+            "error_rms": (stats["error_sq"] / error_n) ** 0.5 if error_n else None,
+            "settle_s": stats["settle_s"],
+            "stop_latency_ms": stats["stop_latency_ms"],
+        }
+
+    def get_route_report(self):
+        return self.__route_report
+
+    def get_scan_report(self):
+        return self.__scan_report
+
+    def get_ephemeris_error(self):
+        return self.__ephemeris.get_error() if self.__ephemeris else None
+
     def set_location(self, location: EarthLocation):
         self.__location = location
+        self.__publish(
+            location=(
+                MountState.round(location.lat.deg),
+                MountState.round(location.lon.deg),
+                MountState.round(location.height.to_value(units.m), 3),
+            )
+        )
 
+    @TRANSFORMS.time(op="set_target")
     def set_target(self, alt=None, az=None, ra=None, dec=None) -> None:
         if alt is not None and az is not None:
             altaz_frame = AltAz(obstime=self.__now_utc(), location=self.__location)
@@ -223,7 +537,9 @@ class Radiotelescope(Mount):
             self.__target = altaz_coords.transform_to("icrs")
         elif ra is not None and dec is not None:
             self.__target = SkyCoord(ra=ra, dec=dec, frame="icrs")
+        self.__publish_coords()
 
+    @TRANSFORMS.time(op="set_absolute_offset")
     def set_absolute_offset(self, alt=None, az=None, ra=None, dec=None) -> None:
         if alt is not None or az is not None:
             altaz_frame = AltAz(obstime=self.__now_utc(), location=self.__location)
@@ -240,7 +556,9 @@ class Radiotelescope(Mount):
                 dec=dec if dec is not None else self.__target.dec,
                 frame="icrs",
             )
+        self.__publish_coords()
 
+    @TRANSFORMS.time(op="set_relative_offset")
     def set_relative_offset(self, alt=None, az=None, ra=None, dec=None) -> None:
         if alt is not None or az is not None:
             altaz_frame = AltAz(obstime=self.__now_utc(), location=self.__location)
@@ -257,87 +575,95 @@ class Radiotelescope(Mount):
                 dec=self.__target.dec - dec if dec is not None else self.__target.dec,
                 frame="icrs",
             )
-
-    def run(self, bh: str) -> None:
+        self.__publish_coords()
+
+    def run(self, bh: str, cancel: threading.Event | None = None, **params) -> None:
+        self.__stop = threading.Event() if cancel is None else cancel
+        self.__stop_time = None
+        self.__setpoint = None  # cleared first, get_on_target reads them
+        self.__tracking_error = None
+        self.__fault = None
         self.__running = True
+        self.__behavior = bh
+        self.__publish(behavior=bh, running=True)
+        self.__control_stats = {
+            "ticks": 0,
+            "overruns": 0,
+            "jitter_sq": 0.0,
+            "jitter_max": 0.0,
+            "error_n": 0,
+            "error_sq": 0.0,
+            "settle_s": None,
+            "stop_latency_ms": None,
+        }
+        controller = threading.Thread(
+            target=self.__control_loop, args=(self.__stop,), daemon=True
+        )
+        controller.start()
+
+        try:
+            self.__behave(bh, params)
+        finally:
+            self.__running = False
+            controller.join()
+            self.__publish(running=False)
+        if self.__fault is not None:  # the executor marks the run failed
+            raise RuntimeError(self.__fault)
+
+        stats = self.get_control_stats()
+        Logging.info(
+            f"Control loop {stats['ticks']} ticks, "
+            f"jitter rms {stats['jitter_rms_ms']:.2f}ms "
+            f"max {stats['jitter_max_ms']:.2f}ms, {stats['overruns']} overruns, "
+            f"tracking error rms {stats['error_rms']}"
+            + (
+                f", stopped in {stats['stop_latency_ms']:.1f}ms"
+                if stats["stop_latency_ms"] is not None
+                else ""
+            ),
+            "Radiotelescope",
+        )
+        Logging.info("Done run", "Radiotelescope")
+
+    def __behave(self, bh: str, params: dict) -> None:
         if bh == "follow":
-            while self.__running:
-                sleep(1)
-                altaz_frame = AltAz(obstime=self.__now_utc(), location=self.__location)
-                altaz_coords = self.__target.transform_to(altaz_frame)
-                self.__run(altaz_coords.az.deg, altaz_coords.alt.deg)
+            self.__ephemeris = Ephemeris(
+                self.__target,
+                self.__location,
+                span=self.EPHEMERIS_SPAN_S,
+                step=self.EPHEMERIS_STEP_S,
+            )
+            while not self.__stop.wait(1 / self.FOLLOW_RATE_HZ):
+                t = time()
+                self.__setpoint = (
+                    *self.__ephemeris.at(t),
+                    *self.__ephemeris.rate_at(t),
+                )
         elif bh == "transit":
             altaz_frame = AltAz(obstime=self.__now_utc(), location=self.__location)
             altaz_coords = self.__target.transform_to(altaz_frame)
-            self.__run(altaz_coords.az.deg, altaz_coords.alt.deg)
-            TBD().write(
-                [
-                    # Measure 1
-                    ("C4", 0.25),
-                    ("E4", 0.25),
-                    ("G4", 0.25),
-                    ("C5", 0.25),
-                    # Measure 2
-                    ("B4", 0.25),
-                    ("A4", 0.25),
-                    ("G4", 0.5),
-                    # Measure 3
-                    ("E4", 0.25),
-                    ("F4", 0.25),
-                    ("G4", 0.25),
-                    (None, 0.25),
-                    # Measure 4
-                    ("C5", 0.5),
-                    ("B4", 0.25),
-                    ("A4", 0.25),
-                    # # Measure 5
-                    ("G4", 0.25),
-                    ("A4", 0.25),
-                    ("B4", 0.25),
-                    ("D5", 0.25),
-                    # Measure 6
-                    ("C5", 0.5),
-                ]
-            )
+            self.__setpoint = (altaz_coords.az.deg, altaz_coords.alt.deg, 0.0, 0.0)
+            self.__wait_settled()
+            if not self.__stop.is_set():
+                TBD().write("done", priority=1)
         elif bh == "route":
-            path_coords = self.__linear_path(start=self.__offset, end=self.__target)
-            for path_coord in path_coords:
-                sleep(5)
-                altaz_frame = AltAz(obstime=self.__now_utc(), location=self.__location)
-                altaz_coords = path_coord.transform_to(altaz_frame)
-                self.__run(altaz_coords.az.deg, altaz_coords.alt.deg)
-                TBD().write(
-                    [
-                        # Measure 1
-                        ("C4", 0.25),
-                        ("E4", 0.25),
-                        ("G4", 0.25),
-                        ("C5", 0.25),
-                        # Measure 2
-                        ("B4", 0.25),
-                        ("A4", 0.25),
-                        ("G4", 0.5),
-                        # Measure 3
-                        ("E4", 0.25),
-                        ("F4", 0.25),
-                        ("G4", 0.25),
-                        (None, 0.25),
-                        # Measure 4
-                        ("C5", 0.5),
-                        ("B4", 0.25),
-                        ("A4", 0.25),
-                        # # Measure 5
-                        ("G4", 0.25),
-                        ("A4", 0.25),
-                        ("B4", 0.25),
-                        ("D5", 0.25),
-                        # Measure 6
-                        ("C5", 0.5),
-                    ]
-                )
-
-        self.__running = False
-        print("Done run")
+            path_coords = self.trajectory.path(self.__offset, self.__target)
+            self.__route(path_coords)
+            if not self.__stop.is_set():
+                TBD().write("done", priority=1)
+        elif bh in ["raster", "spiral"]:
+            self.__scan(bh, **params)
+            if not self.__stop.is_set():
+                TBD().write("done", priority=1)
 
     def stop(self) -> None:
+        self.__stop_time = monotonic()
+        self.__stop.set()
         self.__running = False
+        TBD().cancel()
+        self.__publish(running=False)
+
+    def shutdown(self) -> None:
+        super().shutdown()
+        Singleton().drive_azimuth(0)
+        Singleton().drive_altitude(0)
@@ -0,0 +1,154 @@
+import math
+import random
+import struct
+import threading
+from time import sleep
+from time import monotonic
+from classes.Logging import Logging
+
+
+class SimMotor:
+    """DC motor with first order inertia, driven like an L298N channel"""
+
+    def __init__(self, max_speed: float, tau: float, max_accel: float, angle=0.0):
+        self.MAX_SPEED = max_speed  # deg/s at full duty
+        self.TAU = tau  # seconds to reach ~63% of the commanded speed
+        self.MAX_ACCEL = max_accel  # deg/s²
+        self.in1 = 0
+        self.in2 = 0
+        self.pwm = 0.0
+        self.angle = angle
+        self.speed = 0.0
+
+    def step(self, dt: float):
+        direction = (self.in1 and not self.in2) - (self.in2 and not self.in1)
+        target = direction * min(max(self.pwm, 0.0), 1.0) * self.MAX_SPEED
+        accel = (target - self.speed) / self.TAU
+        accel = max(-self.MAX_ACCEL, min(self.MAX_ACCEL, accel))
+        self.speed += accel * dt
+        self.angle += self.speed * dt
+
+
+class SimPWM:
+    """Stands in for gpiozero.PWMLED on a motor enable pin"""
+
+    def __init__(self, motor: SimMotor):
+        self.__motor = motor
+
+    @property
+    def value(self):
+        return self.__motor.pwm
+
+    @value.setter
+    def value(self, value):
+        self.__motor.pwm = value
+
+
+class SimGPIO:
+    """Stands in for RPi.GPIO, output pins are wired to motor inputs"""
+
+    HIGH = 1
+    LOW = 0
+    OUT = "out"
+    BCM = "bcm"
+
+    def __init__(self):
+        self.__pins = {}
+
+    def wire(self, pin: int, motor: SimMotor, attr: str):
+        self.__pins[pin] = (motor, attr)
+
+    def setmode(self, mode):
+        pass
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, mode):
+        pass
+
+    def output(self, pin, value):
+        motor, attr = self.__pins[pin]
+        setattr(motor, attr, value)
+
+
+class SimEncoder:
+    """Stands in for gpiozero.RotaryEncoder on the azimuth shaft"""
+
+    def __init__(self, motor: SimMotor, steps_per_degree=1.0, max_steps=360):
+        self.STEPS_PER_DEGREE = steps_per_degree
+        self.MAX_STEPS = max_steps
+        self.when_rotated = None
+        self.__motor = motor
+        self.__count = 0  # unwrapped
+        self.steps = 0
+
+    def update(self):
+        count = math.floor(self.__motor.angle * self.STEPS_PER_DEGREE)
+        while self.__count != count:  # one callback per quadrature step
+            self.__count += 1 if count > self.__count else -1
+            span = 2 * self.MAX_STEPS
+            self.steps = (self.__count + self.MAX_STEPS) % span - self.MAX_STEPS
+            if self.when_rotated is not None:
+                self.when_rotated()
+
+
+class SimMPU6050:
+    """Stands in for smbus2.SMBus with an MPU6050 on the altitude axis"""
+
+    def __init__(self, motor: SimMotor, noise_g=0.002, noise_dps=0.05):
+        self.NOISE_G = noise_g
+        self.NOISE_DPS = noise_dps
+        self.__motor = motor
+
+    def write_byte_data(self, addr, register, value):
+        pass
+
+    def read_i2c_block_data(self, addr, register, length):
+        alt = math.radians(self.__motor.angle)
+        ax = math.cos(alt) + random.gauss(0, self.NOISE_G)
+        ay = math.sin(alt) + random.gauss(0, self.NOISE_G)
+        az = random.gauss(0, self.NOISE_G)
+        gz = self.__motor.speed + random.gauss(0, self.NOISE_DPS)
+        raw = [int(max(-32768, min(32767, v * 16384))) for v in (ax, ay, az)]
+        raw += [0, 0, 0, int(max(-32768, min(32767, gz * 131)))]
+        return list(struct.pack(">7h", *raw))[:length]
+
+    def close(self):
+        pass
+
+
+class Simulator:
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(Simulator, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, "_initialized") and self._initialized:
+            return
+
+        self._initialized = True
+        self.PHYSICS_RATE_HZ = 500
+
+        self.azimuth = SimMotor(max_speed=10.0, tau=0.3, max_accel=20.0)
+        self.altitude = SimMotor(max_speed=5.0, tau=0.3, max_accel=10.0, angle=45.0)
+        self.gpio = SimGPIO()
+        self.encoder = SimEncoder(self.azimuth)
+        self.imu = SimMPU6050(self.altitude)
+
+        threading.Thread(target=self.__physics_loop, daemon=True).start()
+        Logging.info("Simulated mount hardware running.", "Simulator")
+
+    def __physics_loop(self):
+        period = 1 / self.PHYSICS_RATE_HZ
+        last = monotonic()
+        while True:
+            sleep(period)
+            now = monotonic()
+            dt, last = now - last, now
+            self.azimuth.step(dt)
+            self.altitude.step(dt)
+            self.encoder.update()
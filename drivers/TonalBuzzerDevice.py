@@ -1,8 +1,40 @@
+import queue
+import itertools
+import threading
 import drivers.is_rpi
-from time import sleep
 from gpiozero import TonalBuzzer
 from classes.Device import Device
 
+TUNES = {
+    "done": [
+        # Measure 1
+        ("C4", 0.25),
+        ("E4", 0.25),
+        ("G4", 0.25),
+        ("C5", 0.25),
+        # Measure 2
+        ("B4", 0.25),
+        ("A4", 0.25),
+        ("G4", 0.5),
+        # Measure 3
+        ("E4", 0.25),
+        ("F4", 0.25),
+        ("G4", 0.25),
+        (None, 0.25),
+        # Measure 4
+        ("C5", 0.5),
+        ("B4", 0.25),
+        ("A4", 0.25),
+        # # Measure 5
+        ("G4", 0.25),
+        ("A4", 0.25),
+        ("B4", 0.25),
+        ("D5", 0.25),
+        # Measure 6
+        ("C5", 0.5),
+    ],
+}
+
 
 class Singleton:
     _instance = None
@@ -18,18 +50,96 @@ class Singleton:
 
         self._initialized = True
 
+        self.QUEUE_SIZE = 8
+        self.queue = queue.PriorityQueue(maxsize=self.QUEUE_SIZE)
+        self.seq = itertools.count()
+        self.interrupt = threading.Event()
+        # playing, generation and preempting change together under the lock
+        self.lock = threading.Lock()
+        self.playing = None  # priority of the cue being played
+        self.generation = 0  # bumped by cancel, older queued cues are dropped
+        self.preempting = None  # (priority, seq) queued while nothing played
+
+        self.tonal_buzzer = None
         if drivers.is_rpi.is_rpi():
             TBPIN = 4
             self.tonal_buzzer = TonalBuzzer(TBPIN)
+            threading.Thread(target=self.__playback_loop, daemon=True).start()
+
+    def __playback_loop(self):
+        while True:
+            priority, seq, generation, tune = self.queue.get()
+            with self.lock:
+                # a cancel or a preempting cue may land between get and here
+                preempting, self.preempting = self.preempting, None
+                if generation != self.generation or (
+                    preempting is not None
+                    and preempting[1] != seq
+                    and preempting[0] >= -priority
+                ):
+                    continue
+                self.playing = -priority
+            for note, duration in tune:
+                if note is None:
+                    self.tonal_buzzer.stop()
+                else:
+                    self.tonal_buzzer.play(note)
+                if self.interrupt.wait(duration):
+                    break
+            self.tonal_buzzer.stop()
+            with self.lock:  # cleared before the next get, never after it
+                self.playing = None
+                self.interrupt.clear()
 
 
 class TonalBuzzerDevice(Device):
     def __init__(self):
         pass
 
-    def write(self, tune):
-        if drivers.is_rpi.is_rpi():
-            for note, duration in tune:
-                Singleton().tonal_buzzer.play(note)
-                sleep(duration)
-            Singleton().tonal_buzzer.stop()
+    def write(self, tune, priority: int = 0, preempt: bool = True) -> bool:
+        """Queues a tune (a TUNES name or a list of (note, seconds)) and returns
+        at once; with preempt it cuts the cue being played if that one does not
+        have a higher priority. Returns False when the cue was dropped."""
+        hw = Singleton()
+        if hw.tonal_buzzer is None:
+            return False
+        tune = TUNES[tune] if isinstance(tune, str) else tune
+
+        with hw.lock:
+            seq = next(hw.seq)
+            if preempt:
+                self.__drain(priority)
+                playing = hw.playing
+                if playing is None:
+                    hw.preempting = (priority, seq)
+                elif playing <= priority:
+                    hw.interrupt.set()
+            try:
+                hw.queue.put_nowait((-priority, seq, hw.generation, tune))
+                return True
+            except queue.Full:
+                return False
+
+    def cancel(self) -> None:
+        """Stops the current cue and drops all queued ones"""
+        hw = Singleton()
+        with hw.lock:
+            hw.generation += 1
+            hw.preempting = None
+            self.__drain(None)
+            if hw.playing is not None:
+                hw.interrupt.set()
+
+    def __drain(self, priority: int | None) -> None:
+        # drops queued cues whose priority is not above the given one
+        hw = Singleton()
+        kept = []
+        while True:
+            try:
+                item = hw.queue.get_nowait()
+            except queue.Empty:
+                break
+            if priority is not None and -item[0] > priority:
+                kept.append(item)
+        for item in kept:
+            hw.queue.put_nowait(item)
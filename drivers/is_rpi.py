@@ -1,11 +1,5 @@
-import io
+from drivers.HardwareProbe import HardwareProbe
 
 
 def is_rpi():
-    try:
-        with io.open("/sys/firmware/devicetree/base/model", "r") as m:
-            if "raspberry pi" in m.read().lower():
-                return True
-    except Exception:
-        pass
-    return False
+    return HardwareProbe.probe()["is_rpi"]
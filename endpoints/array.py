@@ -0,0 +1,69 @@
+from pathlib import Path
+from classes.Gateway import Gateway
+from endpoints.mount import validate_target
+from flask import request, jsonify, Blueprint
+
+array_bp = Blueprint(Path(__file__).stem, __name__)
+gateway = Gateway()
+
+
+@array_bp.before_request
+def array_bp_before_request():
+    # same rules as the node servers, one session for the whole array
+    token = request.headers.get("Authorization")
+    if token and gateway.sid and token != gateway.sid:
+        return jsonify({"error": "session already acquired"}), 401
+    if token and not gateway.sid:
+        return jsonify({"error": "no active session"}), 401
+    if not token and request.path != "/array/acquire":
+        return jsonify({"error": "unauthorized"}), 401
+
+
+def aggregate(results: list):
+    """Per node results with a summary, 502 when no node succeeded"""
+    ok = [r for r in results if r["error"] is None]
+    latencies = [r["latency_ms"] for r in results]
+    body = {
+        "nodes": results,
+        "ok": len(ok),
+        "failed": len(results) - len(ok),
+        "latency_ms": {
+            "max": max(latencies, default=None),
+            "mean": (round(sum(latencies) / len(latencies), 2) if latencies else None),
+        },
+    }
+    return jsonify(body), 200 if ok or not results else 502
+
+
+@array_bp.route("/acquire", methods=["GET"])
+def array_acquire():
+    sid = gateway.acquire()
+    if sid is None:
+        return jsonify({"message": "session in use"}), 403
+    return jsonify({"session_id": sid}), 200
+
+
+@array_bp.route("/release", methods=["GET"])
+def array_release():
+    if gateway.release():
+        return jsonify({"message": "ok"}), 200
+    return jsonify({"message": "cannot release an empty session"}), 403
+
+
+@array_bp.route("/nodes", methods=["GET"])
+def array_nodes():
+    return jsonify({"nodes": [node.to_dict() for node in gateway.get_nodes()]}), 200
+
+
+@array_bp.route("/status", methods=["GET"])
+def array_status():
+    return aggregate(gateway.fan_out("GET", "/mount/status"))
+
+
+@array_bp.route("/target", methods=["POST"])
+def array_target():
+    data = request.get_json(silent=True)
+    error = validate_target(data)
+    if error:
+        return jsonify({"error": error}), 400
+    return aggregate(gateway.fan_out("POST", "/mount/target", data))
@@ -0,0 +1,65 @@
+from pathlib import Path
+from classes.Catalog import Catalog
+from classes.Startup import Startup
+from endpoints.mount import is_float
+from flask import request, jsonify, Blueprint
+from SessionProperties import SessionProperties as SP
+
+catalog_bp = Blueprint(Path(__file__).stem, __name__)
+
+
+def local_sidereal_time(location) -> float:
+    from astropy.time import Time
+
+    return float(Time.now().sidereal_time("mean", longitude=location.lon).deg)
+
+
+@catalog_bp.before_request
+def catalog_bp_before_request():
+    if Startup.get_mount() is None:
+        return jsonify({"error": "unknown hardware type for the mount"}), 400
+
+
+@catalog_bp.route("/<path:name>", methods=["GET"])
+def catalog_resolve(name):
+    source = Catalog.resolve(name)
+    if source is None:
+        return jsonify({"error": f"unknown source {name}"}), 404
+    return jsonify(source), 200
+
+
+@catalog_bp.route("/search", methods=["GET"])
+def catalog_search():
+    args = request.args
+    for key in ["ra", "dec", "alt", "az", "radius", "min_alt", "limit"]:
+        if key in args and not is_float(args[key]):
+            return jsonify({"error": f"{key} must be a number"}), 400
+    if ("ra" in args) != ("dec" in args):
+        return jsonify({"error": "position should have both ra and dec"}), 400
+    if ("alt" in args) != ("az" in args):
+        return jsonify({"error": "position should have both alt and az"}), 400
+    if "ra" in args and "alt" in args:
+        return jsonify({"error": "position should be in ra/dec or alt/az"}), 400
+
+    ra = float(args["ra"]) if "ra" in args else None
+    dec = float(args["dec"]) if "dec" in args else None
+    lst = lat = None
+    if "min_alt" in args or "alt" in args:
+        location = SP().MOUNT.get_location()
+        if location is None:
+            return jsonify({"error": "mount location is not set"}), 400
+        lst, lat = local_sidereal_time(location), float(location.lat.deg)
+        if "alt" in args:
+            ra, dec = Catalog.radec(float(args["alt"]), float(args["az"]), lst, lat)
+
+    sources = Catalog.search(
+        ra=ra,
+        dec=dec,
+        radius=float(args["radius"]) if "radius" in args else None,
+        min_alt=float(args["min_alt"]) if "min_alt" in args else None,
+        lst=lst,
+        lat=lat,
+        kind=args.get("kind"),
+        limit=int(float(args["limit"])) if "limit" in args else None,
+    )
+    return jsonify({"sources": sources}), 200
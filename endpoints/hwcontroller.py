@@ -1,13 +1,95 @@
+import threading
 from pathlib import Path
+from classes.DeviceInfo import DeviceInfo
 from flask import jsonify, request, Blueprint
-from drivers.Monitor import Monitor
+from SessionProperties import SessionProperties as SP
 
 hwcontroller_bp = Blueprint(Path(__file__).stem, __name__)
-mount = Monitor()
+_monitor = None
+_monitor_lock = threading.Lock()
+
+BATCH_MAX_KEYFRAMES = 1000
+BATCH_MAX_SECONDS = 3600
+
+
+@hwcontroller_bp.before_request
+def hwcontroller_bp_before_request():
+    # the PCA9685 is only set up on the boards whose mount is the Monitor
+    if DeviceInfo.mount_name() != "Monitor":
+        return (
+            jsonify({"ok": False, "error": "no servo controller on this board"}),
+            400,
+        )
+
+
+def get_monitor():
+    """The session mount when it is a Monitor, else one built on first use"""
+    global _monitor
+    Monitor = DeviceInfo.get_driver("Monitor")
+    if isinstance(SP().MOUNT, Monitor):
+        return SP().MOUNT
+    if _monitor is None:
+        with _monitor_lock:
+            if _monitor is None:
+                _monitor = Monitor()
+    return _monitor
+
+
+def parse_moves(moves):
+    """Validates [{"ch", "angle" or "pulse"}, ...] into angles and pulses"""
+    if not isinstance(moves, list) or not moves:
+        raise ValueError("moves must be a non empty list")
+    angles, pulses = {}, {}
+    for move in moves:
+        if not isinstance(move, dict):
+            raise ValueError("every move must be an object")
+        ch = move.get("ch")
+        if not isinstance(ch, int) or isinstance(ch, bool) or not 0 <= ch < 16:
+            raise ValueError("ch must be an integer between 0 and 15")
+        if ch in angles or ch in pulses:
+            raise ValueError(f"channel {ch} appears twice")
+        if ("angle" in move) == ("pulse" in move):
+            raise ValueError(f"channel {ch} needs either angle or pulse")
+        value = move.get("angle", move.get("pulse"))
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise ValueError(f"channel {ch} value must be a number")
+        if "angle" in move:
+            if not 0 <= value <= 180:
+                raise ValueError("angle must be between 0 and 180")
+            angles[ch] = float(value)
+        else:
+            period_us = get_monitor().PERIOD_US
+            if not 0 <= value <= period_us:
+                raise ValueError(f"pulse must be between 0 and {period_us:.0f}")
+            pulses[ch] = float(value)
+    return angles, pulses
+
+
+def parse_keyframes(keyframes):
+    """Validates [{"t", "moves"}, ...] into (seconds, angles, pulses) in order"""
+    if not isinstance(keyframes, list) or not keyframes:
+        raise ValueError("keyframes must be a non empty list")
+    if len(keyframes) > BATCH_MAX_KEYFRAMES:
+        raise ValueError(f"at most {BATCH_MAX_KEYFRAMES} keyframes")
+    parsed, last = [], -1.0
+    for keyframe in keyframes:
+        if not isinstance(keyframe, dict):
+            raise ValueError("every keyframe must be an object")
+        t = keyframe.get("t")
+        if not isinstance(t, (int, float)) or isinstance(t, bool):
+            raise ValueError("keyframe t must be a number")
+        if t <= last or t > BATCH_MAX_SECONDS:
+            raise ValueError(
+                f"keyframe t must increase and be between 0 and {BATCH_MAX_SECONDS}"
+            )
+        parsed.append((float(t), *parse_moves(keyframe.get("moves"))))
+        last = t
+    return parsed
 
 
 @hwcontroller_bp.route("/move", methods=["POST"])
 def move_servo():
+    mount = get_monitor()
     ch = int(request.args.get("ch", 0))
     angle = float(request.args.get("angle", 90))
     ok, err = mount.move_servo(ch, angle)
@@ -16,14 +98,49 @@ def move_servo():
     return jsonify({"ok": True, "ch": ch, "angle": angle})
 
 
+@hwcontroller_bp.route("/batch", methods=["POST"])
+def move_batch():
+    mount = get_monitor()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not ("moves" in data or "keyframes" in data):
+        return jsonify({"ok": False, "error": "'moves' or 'keyframes'"}), 400
+    if "moves" in data and "keyframes" in data:
+        return jsonify({"ok": False, "error": "either 'moves' or 'keyframes'"}), 400
+
+    try:
+        if "moves" in data:
+            keyframes = [(0.0, *parse_moves(data["moves"]))]
+        else:
+            keyframes = parse_keyframes(data["keyframes"])
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+    if len(keyframes) == 1 and keyframes[0][0] == 0.0:
+        ok, err = mount.move_batch(*keyframes[0][1:])
+    else:
+        ok, err = mount.play(keyframes)
+    if not ok:
+        return jsonify({"ok": False, "error": err}), 400
+    return jsonify(
+        {
+            "ok": True,
+            "keyframes": len(keyframes),
+            "moves": sum(len(a) + len(p) for _, a, p in keyframes),
+            "duration": keyframes[-1][0],
+        }
+    )
+
+
 @hwcontroller_bp.route("/stop", methods=["POST"])
 def stop():
+    mount = get_monitor()
     mount.stop()
     return jsonify({"ok": True, "message": "Servos stopped"})
 
 
 @hwcontroller_bp.route("/status", methods=["GET"])
 def status():
+    mount = get_monitor()
     return jsonify(
         {
             "running": mount.get_running(),
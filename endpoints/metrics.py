@@ -0,0 +1,10 @@
+from pathlib import Path
+from flask import Response, Blueprint
+from classes.Metrics import Metrics
+
+metrics_bp = Blueprint(Path(__file__).stem, __name__)
+
+
+@metrics_bp.route("", methods=["GET"])
+def metrics():
+    return Response(Metrics.render(), mimetype="text/plain; version=0.0.4")
@@ -1,16 +1,16 @@
 import math
 import os.path
-import threading
 from pathlib import Path
-from astropy import units
-from drivers.Monitor import Monitor
+from classes.Catalog import Catalog
+from classes.Startup import Startup
+from classes.Telemetry import Telemetry
 from SessionProperties import SessionProperties as SP
-from flask import request, jsonify, Blueprint
-from astropy.coordinates import EarthLocation
-from drivers.Radiotelescope import Radiotelescope
+from flask import request, jsonify, Blueprint, Response, stream_with_context
 
 mount_bp = Blueprint(Path(__file__).stem, __name__)
 
+SCAN_MAX_SAMPLES = 20000
+
 
 def is_float(value: str) -> bool:
     try:
@@ -20,15 +20,46 @@ def is_float(value: str) -> bool:
         return False
 
 
+def validate_target(data) -> str | None:
+    """Error message for a malformed /target body, None when it is valid"""
+    if not data:
+        return "empty body"
+    if "ra" in data and "dec" not in data:
+        return "missing required field target.dec"
+    if "dec" in data and "ra" not in data:
+        return "missing required field target.ra"
+    if "alt" in data and "az" not in data:
+        return "missing required field target.az"
+    if "az" in data and "alt" not in data:
+        return "missing required field target.alt"
+    if "ra" in data and "alt" in data:
+        return "target should be in ra/dec or alt/az"
+    if "name" in data and ("ra" in data or "alt" in data):
+        return "target should be a name, ra/dec or alt/az"
+    if not any(key in data for key in ["name", "ra", "alt"]):
+        return "neither name, ra/dec nor alt/az"
+    return None
+
+
 @mount_bp.before_request
 def mount_bp_before_request():
-    if SP().MOUNT is None:
+    Startup.request_started()
+    if Startup.get_mount() is None:
         return jsonify({"error": "unknown hardware type for the mount"}), 400
 
 
+@mount_bp.after_request
+def mount_bp_after_request(response):
+    Startup.request_finished()
+    return response
+
+
 @mount_bp.route("/location", methods=["POST"])
 def mount_location():
-    if SP().MOUNT.get_running():
+    from astropy import units
+    from astropy.coordinates import EarthLocation
+
+    if SP().MOUNT.get_executor().busy():
         return jsonify({"error": "already moving"}), 403
 
     data = request.get_json()
@@ -56,38 +87,35 @@ def mount_location():
 
 @mount_bp.route("/target", methods=["POST"])
 def mount_target():
-    if SP().MOUNT.get_running():
+    from astropy import units
+
+    if SP().MOUNT.get_executor().busy():
         return jsonify({"error": "already moving"}), 403
 
     data = request.get_json()
-    if not data:
-        return jsonify({"error": "empty body"}), 400
-
-    if "ra" in data and "dec" not in data:
-        return jsonify({"error": "missing required field target.dec"}), 400
-    if "dec" in data and "ra" not in data:
-        return jsonify({"error": "missing required field target.ra"}), 400
-    if "alt" in data and "az" not in data:
-        return jsonify({"error": "missing required field target.az"}), 400
-    if "az" in data and "alt" not in data:
-        return jsonify({"error": "missing required field target.alt"}), 400
-    if "ra" in data and "alt" in data:
-        return jsonify({"error": "target should be in ra/dec or alt/az"}), 400
-
-    if "az" in data:
+    error = validate_target(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    if "name" in data:
+        source = Catalog.resolve(str(data["name"]))
+        if source is None:
+            return jsonify({"error": f"unknown source {data['name']}"}), 404
+        SP().MOUNT.set_target(
+            ra=source["ra"] * units.deg, dec=source["dec"] * units.deg
+        )
+    elif "az" in data:
         alt = data["alt"]
         az = data["az"]
         alt = alt * units.deg if is_float(alt) else alt
         az = az * units.deg if is_float(az) else az
         SP().MOUNT.set_target(alt=alt, az=az)
-    elif "ra" in data:
+    else:
         ra = data["ra"]
         dec = data["dec"]
         ra = ra * units.deg if is_float(ra) else ra
         dec = dec * units.deg if is_float(dec) else dec
         SP().MOUNT.set_target(ra=ra, dec=dec)
-    else:
-        return jsonify({"error": "neither ra/dec nor alt/az"}), 400
 
     target = SP().MOUNT.get_target()
     return (
@@ -106,7 +134,9 @@ def mount_target():
 
 @mount_bp.route("/offset", methods=["POST"])
 def mount_offset():
-    if SP().MOUNT.get_running():
+    from astropy import units
+
+    if SP().MOUNT.get_executor().busy():
         return jsonify({"error": "already moving"}), 403
 
     data = request.get_json()
@@ -162,7 +192,8 @@ def mount_offset():
 
 @mount_bp.route("/run", methods=["GET"])
 def mount_run():
-    if SP().MOUNT.get_running():
+    wait = request.args.get("queue", "0") not in ["0", "false"]
+    if not wait and SP().MOUNT.get_executor().busy():
         return jsonify({"error": "already moving"}), 403
     if SP().MOUNT.get_location() is None:
         return jsonify({"error": "mount location is not set"}), 400
@@ -172,55 +203,119 @@ def mount_run():
     bh = request.args.get("bh")
     if not bh:
         return jsonify({"error": "missing required argument bh"}), 400
-    if bh not in ["follow", "transit", "route"]:
-        return jsonify({"error": "bh must be 'follow', 'transit' or 'route'"}), 400
+    if bh not in ["follow", "transit", "route", "raster", "spiral"]:
+        error = "bh must be 'follow', 'transit', 'route', 'raster' or 'spiral'"
+        return jsonify({"error": error}), 400
     if bh in ["transit", "route"] and not SP().MOUNT.get_offset():
         return jsonify({"error": f"mount offset must be set when bh is {bh}"}), 400
 
-    thread = threading.Thread(target=lambda: SP().MOUNT.run(bh))
-    thread.start()
+    params = {}
+    if bh in ["raster", "spiral"]:
+        for key in ["size", "spacing", "speed", "height"]:
+            value = request.args.get(key)
+            if value is None:
+                continue
+            if not is_float(value) or float(value) <= 0:
+                return jsonify({"error": f"{key} must be a number > 0"}), 400
+            params[key] = float(value)
+        if "size" not in params:
+            return jsonify({"error": "missing required argument size"}), 400
+        if "spacing" not in params:
+            return jsonify({"error": "missing required argument spacing"}), 400
+        size, height = params["size"], params.get("height", params["size"])
+        if bh == "raster":
+            samples = (size / params["spacing"] + 1) * (height / params["spacing"] + 1)
+        else:
+            samples = math.pi * (size / 2) ** 2 / params["spacing"] ** 2
+        if samples > SCAN_MAX_SAMPLES:
+            return (
+                jsonify({"error": f"more than {SCAN_MAX_SAMPLES} scan samples"}),
+                400,
+            )
+
+    try:
+        handle = SP().MOUNT.get_executor().submit(bh, params, wait=wait)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 403
+
+    return jsonify({"message": "ok", "run_id": handle.id}), 200
+
+
+@mount_bp.route("/run/<int:run_id>", methods=["GET"])
+def mount_run_status(run_id):
+    handle = SP().MOUNT.get_executor().get_run(run_id)
+    if handle is None:
+        return jsonify({"error": f"unknown run {run_id}"}), 404
+    return jsonify(handle.to_dict()), 200
+
+
+@mount_bp.route("/runs", methods=["GET"])
+def mount_runs():
+    runs = SP().MOUNT.get_executor().get_runs()
+    return jsonify({"runs": [h.to_dict() for h in runs]}), 200
 
-    return jsonify({"message": "ok"}), 200
+
+@mount_bp.route("/scan", methods=["GET"])
+def mount_scan():
+    report = getattr(SP().MOUNT, "get_scan_report", lambda: None)()
+    if report is None:
+        return jsonify({"error": "no scan recorded"}), 404
+    return jsonify({"samples": report}), 200
+
+
+@mount_bp.route("/control", methods=["GET"])
+def mount_control():
+    stats = getattr(SP().MOUNT, "get_control_stats", lambda: None)()
+    if stats is None:
+        return jsonify({"error": "no run recorded"}), 404
+    return jsonify(stats), 200
 
 
 @mount_bp.route("/stop", methods=["GET"])
 def mount_stop():
-    if not SP().MOUNT.get_running():
-        return jsonify({"error": "already stopped"}), 403
-
-    SP().MOUNT.stop()
+    run_id = request.args.get("run_id")
+    if run_id is not None and not run_id.isdigit():
+        return jsonify({"error": "run_id must be an integer"}), 400
+
+    if not SP().MOUNT.get_executor().cancel(None if run_id is None else int(run_id)):
+        if not SP().MOUNT.get_running():
+            return jsonify({"error": "already stopped"}), 403
+        SP().MOUNT.stop()
     return jsonify({"message": "ok"}), 200
 
 
+telemetry = Telemetry(
+    lambda: SP().MOUNT.get_state().json,
+    rate_hz=float(os.environ.get("TELEMETRY_RATE_HZ", 5)),
+    max_clients=int(os.environ.get("TELEMETRY_MAX_CLIENTS", 8)),
+)
+
+
 @mount_bp.route("/status", methods=["GET"])
 def mount_status():
     if not SP().MOUNT:
         return jsonify({"error": "mount not initialized"}), 400
 
-    position = SP().MOUNT.get_position() or (None, None)
-    offset = SP().MOUNT.get_offset() or type("Obj", (), {"ra": None, "dec": None})()
-    target = SP().MOUNT.get_target() or type("Obj", (), {"ra": None, "dec": None})()
-    location = SP().MOUNT.get_location()
-
-    return (
-        jsonify(
-            {
-                "location": location,
-                "target": {
-                    "ra": (None if target.ra is None else round(target.ra.deg, 6)),
-                    "dec": (None if target.dec is None else round(target.dec.deg, 6)),
-                },
-                "offset": {
-                    "ra": (None if offset.ra is None else round(offset.ra.deg, 6)),
-                    "dec": (None if offset.dec is None else round(offset.dec.deg, 6)),
-                },
-                "position": {
-                    "ra": None if position[0] is None else round(position[0], 6),
-                    "dec": None if position[1] is None else round(position[1], 6),
-                },
-                "bh": getattr(SP().MOUNT, "get_behavior", lambda: None)(),
-                "is_running": getattr(SP().MOUNT, "get_running", lambda: False)(),
-            }
-        ),
-        200,
+    state = SP().MOUNT.get_state()
+    response = Response(state.json, mimetype="application/json")
+    response.set_etag(state.etag)
+    return response.make_conditional(request)
+
+
+@mount_bp.route("/stream", methods=["GET"])
+def mount_stream():
+    changes_only = request.args.get("changes", "0") not in ["0", "false"]
+    # subscribed here so the cap holds before the response starts streaming
+    q = telemetry.subscribe()
+    if q is None:
+        response = jsonify({"error": "too many streams"})
+        response.headers["Retry-After"] = "5"
+        return response, 503
+    response = Response(
+        stream_with_context(telemetry.stream(q, changes_only=changes_only)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
+    # a client gone before the first event never runs the generator's cleanup
+    response.call_on_close(lambda: telemetry.unsubscribe(q))
+    return response
@@ -0,0 +1,134 @@
+import threading
+from pathlib import Path
+from classes.Catalog import Catalog
+from classes.Startup import Startup
+from endpoints.mount import is_float
+from flask import request, jsonify, Blueprint
+from SessionProperties import SessionProperties as SP
+
+schedule_bp = Blueprint(Path(__file__).stem, __name__)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Built on first use, the scheduler module loads astropy"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                from classes.Scheduler import Scheduler
+
+                _scheduler = Scheduler()
+    return _scheduler
+
+
+def parse_time(value):
+    from astropy.time import Time
+
+    if value is None:
+        return None
+    if is_float(value):
+        return float(value)
+    return float(Time(value).unix)  # ISO 8601, UTC
+
+
+def parse_radec(data: dict) -> tuple:
+    from astropy import units
+    from astropy.coordinates import SkyCoord
+
+    if "name" in data:
+        source = Catalog.resolve(str(data["name"]))
+        if source is None:
+            raise ValueError(f"unknown source {data['name']}")
+        return (source["ra"], source["dec"])
+    ra, dec = data["ra"], data["dec"]
+    ra = ra * units.deg if is_float(ra) else ra
+    dec = dec * units.deg if is_float(dec) else dec
+    coord = SkyCoord(ra=ra, dec=dec, frame="icrs")
+    return (float(coord.ra.deg), float(coord.dec.deg))
+
+
+@schedule_bp.before_request
+def schedule_bp_before_request():
+    if Startup.get_mount() is None:
+        return jsonify({"error": "unknown hardware type for the mount"}), 400
+
+
+@schedule_bp.route("", methods=["POST"])
+def schedule_submit():
+    from classes.Scheduler import Observation
+
+    if get_scheduler().get_running():
+        return jsonify({"error": "schedule already running"}), 403
+    if SP().MOUNT.get_executor().busy():
+        return jsonify({"error": "already moving"}), 403
+    if SP().MOUNT.get_location() is None:
+        return jsonify({"error": "mount location is not set"}), 400
+
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "empty body"}), 400
+    if "observations" not in data:
+        return jsonify({"error": "missing required field observations"}), 400
+    if not isinstance(data["observations"], list) or not data["observations"]:
+        return jsonify({"error": "observations must be a non empty list"}), 400
+    if len(data["observations"]) > get_scheduler().MAX_OBSERVATIONS:
+        error = f"at most {get_scheduler().MAX_OBSERVATIONS} observations per schedule"
+        return jsonify({"error": error}), 400
+
+    observations = []
+    for i, item in enumerate(data["observations"]):
+        if "name" not in item and ("ra" not in item or "dec" not in item):
+            return jsonify({"error": f"observation {i} needs a name or ra/dec"}), 400
+        bh = item.get("bh")
+        if bh not in ["follow", "transit", "route"]:
+            error = f"observation {i} bh must be 'follow', 'transit' or 'route'"
+            return jsonify({"error": error}), 400
+        if bh in ["transit", "route"] and "offset" not in item:
+            return jsonify({"error": f"observation {i} needs an offset"}), 400
+        if not is_float(item.get("duration")) or float(item["duration"]) <= 0:
+            return jsonify({"error": f"observation {i} needs a duration > 0"}), 400
+        try:
+            ra, dec = parse_radec(item)
+            offset = parse_radec(item["offset"]) if "offset" in item else None
+            earliest = parse_time(item.get("earliest"))
+            latest = parse_time(item.get("latest"))
+        except (ValueError, KeyError, TypeError) as e:
+            return jsonify({"error": f"observation {i}: {e}"}), 400
+        observations.append(
+            Observation(
+                ra=ra,
+                dec=dec,
+                bh=bh,
+                duration=float(item["duration"]),
+                earliest=earliest,
+                latest=latest,
+                offset=offset,
+            )
+        )
+
+    try:
+        plan = get_scheduler().submit(
+            SP().MOUNT, observations, optimize=data.get("optimize", True)
+        )
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 403
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # planned in the background, GET /schedule shows the order once it is ready
+    return jsonify({"message": "ok", "observations": [o.to_dict() for o in plan]}), 200
+
+
+@schedule_bp.route("", methods=["GET"])
+def schedule_status():
+    return jsonify(get_scheduler().get_status()), 200
+
+
+@schedule_bp.route("/stop", methods=["GET"])
+def schedule_stop():
+    if not get_scheduler().cancel():
+        return jsonify({"error": "already stopped"}), 403
+    return jsonify({"message": "ok"}), 200
@@ -1,5 +1,7 @@
 import uuid
 from pathlib import Path
+from classes.Logging import Logging
+from classes.DeviceInfo import DeviceInfo
 from flask import jsonify, Blueprint
 from SessionProperties import SessionProperties as SP
 
@@ -11,8 +13,9 @@ def session_acquire():
     if not SP().SID:
         SP().SID = uuid.uuid4()
 
-        print(
-            f"[SESSION] Nuova sessione: SID={SP().SID} DEVICE={SP().DEVICE_ID} MOUNT={SP().MOUNT}"
+        Logging.info(
+            f"Nuova sessione: SID={SP().SID} DEVICE={SP().DEVICE_ID} MOUNT={SP().MOUNT}",
+            "SESSION",
         )
 
         return (
@@ -20,7 +23,8 @@ def session_acquire():
                 {
                     "session_id": str(SP().SID),
                     "device_id": SP().DEVICE_ID,
-                    "mount_type": SP().MOUNT,
+                    # known from the board, the mount itself is built lazily
+                    "mount_type": DeviceInfo.mount_name(),
                 }
             ),
             200,
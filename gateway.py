@@ -0,0 +1,63 @@
+import os
+import sys
+import signal
+import argparse
+
+sys.dont_write_bytecode = True
+
+from flask import Flask
+from classes.Logging import Logging
+from endpoints.array import array_bp, gateway
+
+app = Flask(__name__)
+
+app.register_blueprint(array_bp, url_prefix="/array")
+
+
+def parse_node(value: str):
+    """host, host:port or name=host:port"""
+    name, _, address = value.rpartition("=")
+    host, _, port = address.partition(":")
+    return host, int(port) if port else 56361, name or None
+
+
+def serve(host: str, port: int, threads: int):
+    from waitress import create_server
+
+    server = create_server(app, host=host, port=port, threads=threads, ident="gateway")
+
+    def on_signal(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+
+    Logging.info(f"gateway on http://{host}:{port}", "gateway")
+    try:
+        server.run()
+    finally:
+        server.close()
+        gateway.shutdown()
+        Logging.info("gateway stopped", "gateway")
+        Logging.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=56360)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument(
+        "--node",
+        action="append",
+        default=os.environ.get("GATEWAY_NODES", "").split(),
+        help="telescope server as host, host:port or name=host:port, repeatable",
+    )
+    args = parser.parse_args()
+
+    for value in args.node:
+        gateway.add(*parse_node(value))
+    if not gateway.get_nodes():
+        parser.error("no nodes, use --node or GATEWAY_NODES")
+
+    serve(args.host, args.port, args.threads)
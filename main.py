@@ -1,26 +1,42 @@
+import os
 import sys
+import signal
+import argparse
+from time import perf_counter
 
 sys.dont_write_bytecode = True
 
+from classes.Startup import Startup
+from classes.Logging import Logging
 from endpoints.mount import mount_bp
+from endpoints.mount import telemetry
+from classes.Metrics import HTTP_REQUESTS
+from endpoints.catalog import catalog_bp
+from endpoints.metrics import metrics_bp
 from endpoints.session import session_bp
+from endpoints.schedule import schedule_bp
 from classes.DeviceInfo import DeviceInfo
-from flask import Flask, request, jsonify
+from flask import Flask, g, request, jsonify
 from SessionProperties import SessionProperties as SP
 from endpoints.hwcontroller import hwcontroller_bp
 
 SP().DEVICE_ID = DeviceInfo.get_identifier()
-SP().MOUNT = DeviceInfo.select_mount()
 
 app = Flask(__name__)
 
 app.register_blueprint(session_bp, url_prefix="/session")
 app.register_blueprint(mount_bp, url_prefix="/mount")
+app.register_blueprint(schedule_bp, url_prefix="/schedule")
+app.register_blueprint(catalog_bp, url_prefix="/catalog")
 app.register_blueprint(hwcontroller_bp, url_prefix="/hwcontroller")
+app.register_blueprint(metrics_bp, url_prefix="/metrics")
 
 
 @app.before_request
 def app_before_request():
+    g.start = perf_counter()
+    if request.path == "/metrics":  # scrapers have no session
+        return None
     token = request.headers.get("Authorization")
     if token and SP().SID and token != str(SP().SID):
         return jsonify({"error": "session already acquired"}), 401
@@ -30,5 +46,71 @@ def app_before_request():
         return jsonify({"error": "unauthorized"}), 401
 
 
+@app.after_request
+def app_after_request(response):
+    rule = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    HTTP_REQUESTS.observe(
+        perf_counter() - g.start,
+        route=rule,
+        method=request.method,
+        status=response.status_code,
+    )
+    return response
+
+
+def shutdown():
+    if SP().MOUNT is not None:
+        SP().MOUNT.shutdown()
+    Logging.info("server stopped", "main")
+    Logging.flush()
+
+
+def serve(host: str, port: int, threads: int, channel_timeout: int):
+    # one process, so SessionProperties and the hardware singletons stay unique
+    from waitress import create_server
+
+    # streams hold a worker each, half of the pool always stays for the API
+    telemetry.MAX_CLIENTS = min(telemetry.MAX_CLIENTS, max(1, threads // 2))
+
+    server = create_server(
+        app,
+        host=host,
+        port=port,
+        threads=threads,
+        channel_timeout=channel_timeout,
+        ident="server",
+    )
+
+    def on_signal(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+
+    Logging.info(
+        f"serving on http://{host}:{port} with {threads} threads, "
+        f"up to {telemetry.MAX_CLIENTS} streams",
+        "main",
+    )
+    try:
+        server.run()
+    finally:
+        server.close()
+        shutdown()
+
+
+Startup.ready(warmup=os.environ.get("SERVER_WARMUP", "1") != "0")
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port="56361", debug=True)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=56361)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--channel-timeout", type=int, default=120)
+    parser.add_argument("--dev", action="store_true", help="flask debug server")
+    args = parser.parse_args()
+
+    if args.dev:
+        app.run(host=args.host, port=args.port, debug=True)
+    else:
+        serve(args.host, args.port, args.threads, args.channel_timeout)